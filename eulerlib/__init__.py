@@ -19,8 +19,10 @@
 
 """
 
-__all__ = ["numtheory", "prime_numbers", "fibonacci", "pythagoras", "etc"]
+__all__ = ["numtheory", "prime_numbers", "modular", "fibonacci", "pythagoras",
+           "etc"]
 from .numtheory import *
+from .modular import *
 from .prime_numbers import *
 from .fibonacci import *
 from .pythagoras import *
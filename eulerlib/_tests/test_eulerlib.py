@@ -21,11 +21,21 @@
 
 """
 
-from  unittest import TestCase
+from  unittest import TestCase, skipUnless
+import json
+import os
+import tempfile
 import eulerlib.numtheory as NT
 import eulerlib.etc as ETC
 import eulerlib.fibonacci as FIBO
 import eulerlib.prime_numbers as P
+import eulerlib.modular as MOD
+from eulerlib._exceptions import EulerlibInputError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class TestPrimes(TestCase):
     
@@ -62,6 +72,217 @@ class TestPrimes(TestCase):
         test_wgen = P.primes_wheel_fact(10**7)
         self.assertEqual(len(test_wgen),664579)
         self.assertEqual(test_wgen[600000-1],8960453)
+    
+    def test_primes_segmented(self):
+        # Limits on either side of a segment boundary must agree with the
+        # incremental generator.
+        mypgen = P.prime_gen()
+        gen_primes = [next(mypgen) for i in range(30000)]
+        for num in [0, 1, 2, 3, 262143, 262144, 262145, 262147]:
+            test_primes = P.primes(num)
+            self.assertEqual(test_primes, [p for p in gen_primes if p <= num])
+        self.assertEqual(P.primes_wheel_fact(350377)[-1], 350377)
+    
+    def test_primes_float_limit(self):
+        self.assertEqual(P.primes(1e3), P.primes(1000))
+        self.assertEqual(len(P.primes_wheel_fact(1e3)), 168)
+        self.assertEqual(NT.Divisors(1e3).limit, 1000)
+        self.assertRaises(EulerlibInputError, P.primes, 1000.5)
+        self.assertRaises(EulerlibInputError, P.primes, "1000")
+    
+    def test_prime_gen_start(self):
+        test_primes = P.primes_in_range(10**12, 10**12 + 10000)
+        mypgen = P.prime_gen(10**12)
+        self.assertEqual([next(mypgen) for p in test_primes], test_primes)
+        mypgen = P.prime_wheel_fact_gen(10**12)
+        self.assertEqual([next(mypgen) for p in test_primes], test_primes)
+        mypgen = P.prime_wheel_fact_gen(4)
+        self.assertEqual([next(mypgen) for i in range(4)], [5, 7, 11, 13])
+    
+    def test_prime_wheel_sizes(self):
+        test_primes = P.primes(400000)
+        for wheel in [30, 210, 2310, 30030]:
+            mypgen = P.prime_wheel_fact_gen(wheel=wheel)
+            self.assertEqual([next(mypgen) for p in test_primes], test_primes)
+            mypgen = P.prime_wheel_fact_gen(30000, wheel)
+            self.assertEqual(next(mypgen), 30011)
+        self.assertRaises(EulerlibInputError, next, 
+                          P.prime_wheel_fact_gen(wheel=60))
+    
+    def test_prime_stream(self):
+        test_stream = P.PrimeStream()
+        first = [next(test_stream) for i in range(1000)]
+        self.assertEqual(first, P.primes(7919))
+        state = json.loads(json.dumps(test_stream.checkpoint()))
+        resumed = P.PrimeStream.restore(state)
+        self.assertEqual(next(resumed), 7927)
+        test_stream = P.PrimeStream(10**12, wheel=True)
+        self.assertEqual(next(test_stream), 1000000000039)
+        resumed = P.PrimeStream.restore(test_stream.checkpoint())
+        self.assertEqual(next(resumed), 1000000000061)
+        self.assertTrue(resumed.wheel)
+        state["version"] = 0
+        self.assertRaises(EulerlibInputError, P.PrimeStream.restore, state)
+    
+    def test_primes_in_range(self):
+        test_primes = P.primes_in_range(10**12, 10**12 + 100)
+        self.assertEqual(test_primes, [1000000000039, 1000000000061,
+                                       1000000000063, 1000000000091])
+        self.assertEqual(P.primes_in_range(1000, 10000), 
+                         P.primes(10000)[168:])
+        test_gen = P.prime_range_gen(0, 10)
+        self.assertEqual(list(test_gen), [2, 3, 5, 7])
+    
+    def test_prime_cache(self):
+        P.clear_prime_cache()
+        self.assertEqual(P.prime_cache_info()["count"], 0)
+        test_primes = P.primes(100000)
+        self.assertEqual(P.prime_cache_info()["limit"], 100000)
+        test_primes.append(0)
+        self.assertEqual(P.primes(1000), test_primes[:168])
+        self.assertEqual(len(P.primes(200000)), 17984)
+        self.assertEqual(P.prime_cache_info()["count"], 17984)
+        self.assertTrue(P.is_prime(199999))
+        P.set_prime_cache_bound(1000)
+        self.assertEqual(P.prime_cache_info()["count"], 168)
+        self.assertEqual(len(P.primes(200000)), 17984)
+        self.assertEqual(P.prime_cache_info()["limit"], 1000)
+        P.set_prime_cache_bound(10**8)
+        P.clear_prime_cache()
+    
+    def test_aprime_gen(self):
+        import asyncio
+        from eulerlib.aio import aprime_gen
+        
+        async def collect(start, stop, count=None):
+            result = []
+            async for chunk in aprime_gen(start, stop, chunk=10000):
+                result.extend(chunk)
+                if count is not None and len(result) >= count:
+                    break
+            return result
+        
+        loop = asyncio.new_event_loop()
+        try:
+            test_primes = loop.run_until_complete(collect(0, 100000))
+            self.assertEqual(test_primes, P.primes(100000))
+            test_primes = loop.run_until_complete(collect(10**12, None, 1000))
+            self.assertEqual(test_primes[:4], [1000000000039, 1000000000061,
+                                               1000000000063, 1000000000091])
+            self.assertEqual(test_primes, 
+                             P.primes_in_range(10**12, test_primes[-1]))
+        finally:
+            loop.close()
+    
+    def test_primes_parallel(self):
+        self.assertEqual(P.primes(5000000, workers=2), P.primes(5000000))
+        lo = 10**10
+        test_gen = P.prime_range_gen(lo, lo + 5000000, workers=2)
+        self.assertEqual(list(test_gen), P.primes_in_range(lo, lo + 5000000))
+    
+    def test_is_prime(self):
+        prime_set = set(P.primes(20000))
+        for method in ["auto", "miller-rabin", "bpsw", "trial"]:
+            for num in range(-1, 20000):
+                self.assertEqual(P.is_prime(num, method), num in prime_set)
+        # Strong pseudoprimes to several bases and a Carmichael number
+        for num in [3215031751, 3825123056546413051, 
+                    318665857834031151167461, 1024651, 5459*5777]:
+            self.assertFalse(P.is_prime(num))
+            self.assertFalse(P.is_prime(num, "bpsw"))
+        self.assertTrue(P.is_prime(2**61 - 1))
+        self.assertTrue(P.is_prime(2**127 - 1))
+        self.assertFalse(P.is_prime((2**61 - 1)*(2**89 - 1)))
+        self.assertTrue(P.is_prime(999999000001, "trial"))
+        self.assertRaises(EulerlibInputError, P.is_prime, 7, "fermat")
+        self.assertTrue(P.is_prime(1e4 + 7))
+        self.assertTrue(P.is_prime(7.0))
+        self.assertRaises(EulerlibInputError, P.is_prime, 7.5)
+        self.assertRaises(EulerlibInputError, P.is_prime, 1e4 + 7.5)
+    
+    def test_is_prime_many(self):
+        test_values = list(range(-2, 5000)) + [2**61 - 1, 3215031751]
+        test_mask = P.is_prime_many(iter(test_values))
+        self.assertEqual(test_mask, [P.is_prime(v) for v in test_values])
+        self.assertEqual(P.is_prime_many([]), [])
+        self.assertEqual(P.is_prime_many([-5, -2, 0]), [False]*3)
+    
+    @skipUnless(numpy, "requires NumPy")
+    def test_is_prime_many_numpy(self):
+        for values in [[3, 4], [10], [97, 100], [-5, -2, 0], 
+                       [[2, 3], [4, 5]], [2**31 - 1, 3215031751, 2**61 - 1]]:
+            arr = numpy.array(values, dtype=numpy.int64)
+            test_mask = P.is_prime_many(arr)
+            self.assertEqual(test_mask.shape, arr.shape)
+            self.assertEqual(test_mask.ravel().tolist(), 
+                             [P.is_prime(int(v)) for v in arr.ravel()])
+        arr = numpy.arange(5000, dtype=numpy.uint16)
+        self.assertEqual(int(P.is_prime_many(arr).sum()), 669)
+    
+    def test_prime_pi_sum(self):
+        self.assertEqual(P.prime_pi(10**8), 5761455)
+        self.assertEqual(P.prime_sum(2*10**6), 142913828922)
+        test_primes = P.primes(1000)
+        for x in [0, 1, 2, 3, 10, 100, 997, 1000]:
+            self.assertEqual(P.prime_pi(x), 
+                             len([p for p in test_primes if p <= x]))
+            self.assertEqual(P.prime_power_sum(x, 3),
+                             sum([p**3 for p in test_primes if p <= x]))
+    
+    @skipUnless(numpy, "requires NumPy")
+    def test_prime_pi_sum_numpy(self):
+        for x in [2, 3, 10, 1000, 12345, 2**20, 10**7 + 1, 10**8]:
+            self.assertEqual(P._lucy_hedgehog_numpy(numpy, x), 
+                             P._lucy_hedgehog(x, 0))
+            self.assertEqual(P._lucy_hedgehog_sum_numpy(numpy, x), 
+                             P._lucy_hedgehog(x, 1))
+        self.assertEqual(P.prime_pi(10**10), 455052511)
+        self.assertEqual(P.prime_sum(10**10), 2220822432581729238)
+    
+    def test_prime_table(self):
+        test_table = P.PrimeTable(100000)
+        self.assertEqual(len(test_table), 9592)
+        self.assertEqual(test_table.primes(), P.primes(100000))
+        self.assertTrue(99991 in test_table)
+        self.assertFalse(99993 in test_table)
+        self.assertEqual(list(test_table.prime_gen(90, 110)), 
+                         [97, 101, 103, 107, 109])
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            test_table.save(path)
+            loaded = P.PrimeTable.load(path)
+            self.assertEqual(loaded.limit, 100000)
+            self.assertEqual(len(loaded), 9592)
+            self.assertEqual(list(loaded), test_table.primes())
+            self.assertTrue(loaded.is_prime(2**61 - 1))
+            loaded.close()
+            built = P.PrimeTable.build(path, 100000)
+            self.assertEqual(built.primes(1000), P.primes(1000))
+            built.close()
+            with open(path, "r+b") as f:
+                f.write(b"NOTPRIME")
+            self.assertRaises(EulerlibInputError, P.PrimeTable.load, path)
+            open(path, "wb").close()
+            self.assertRaises(EulerlibInputError, P.PrimeTable.load, path)
+        finally:
+            os.remove(path)
+    
+    def test_prime_table_rank(self):
+        test_table = P.PrimeTable(1000000)
+        self.assertEqual(test_table.prime_pi(1000000), 78498)
+        self.assertEqual(test_table.prime_pi(7919), 1000)
+        self.assertEqual(test_table.prime_pi(7918), 999)
+        self.assertEqual(test_table.nth_prime(1), 2)
+        self.assertEqual(test_table.nth_prime(1000), 7919)
+        self.assertEqual(test_table.nth_prime(78498), 999983)
+        self.assertEqual(test_table.next_prime(7907), 7919)
+        self.assertEqual(test_table.next_prime(999983), 1000003)
+        self.assertEqual(test_table.prev_prime(7919), 7907)
+        self.assertEqual(test_table.prev_prime(1000003), 999983)
+        self.assertEqual(test_table.prime_pi(10**7), 664579)
+        self.assertRaises(EulerlibInputError, test_table.nth_prime, 78499)
+        self.assertRaises(EulerlibInputError, test_table.prev_prime, 2)
 
 class TestNumtheory(TestCase):
         
@@ -69,6 +290,40 @@ class TestNumtheory(TestCase):
         (is_sq,sqroot) = NT.is_square(99460729)
         self.assertTrue(is_sq)
         self.assertEqual(sqroot,9973)
+        self.assertEqual(NT.is_square(10**1000 + 1), (False, 10**500))
+        self.assertEqual(NT.is_square(0), (True, 0))
+        self.assertEqual(NT.is_square(16.0), (True, 4))
+        self.assertEqual(NT.is_square(17.0), (False, 4))
+        self.assertRaises(EulerlibInputError, NT.is_square, 16.5)
+    
+    def test_is_square_many(self):
+        values = [0, 1, 2, 63, 64, 99460729, 99460730, 3**400, 3**400 + 1, -4]
+        self.assertEqual(NT.is_square_many(values), 
+                         [NT.isqrt(v)**2 == v if v >= 0 else False
+                          for v in values])
+        self.assertEqual(NT.is_square_many(range(1, 101)).count(True), 10)
+    
+    @skipUnless(numpy, "requires NumPy")
+    def test_is_square_many_numpy(self):
+        for values in [[3, 4], [0, 1, 2, 63, 64, 99460729, 2**62, -4], 
+                       [[16, 17], [25, 26]], [2**63 - 1, (2**31 - 1)**2]]:
+            arr = numpy.array(values, dtype=numpy.int64)
+            test_mask = NT.is_square_many(arr)
+            self.assertEqual(test_mask.shape, arr.shape)
+            self.assertEqual(test_mask.ravel().tolist(), 
+                             NT.is_square_many(arr.ravel().tolist()))
+        arr = numpy.arange(1000, dtype=numpy.uint16)
+        self.assertEqual(int(NT.is_square_many(arr).sum()), 32)
+    
+    def test_iroot(self):
+        self.assertEqual(NT.iroot(10**30 - 1, 3), 10**10 - 1)
+        self.assertEqual(NT.iroot(10**30, 3), 10**10)
+        self.assertEqual(NT.iroot(-125, 3), -5)
+        self.assertEqual(NT.iroot(2**100, 101), 1)
+        self.assertRaises(EulerlibInputError, NT.iroot, -16, 4)
+        self.assertEqual(NT.is_perfect_power(6**15), (True, 6, 15))
+        self.assertEqual(NT.is_perfect_power(2**64 + 1), (False, 2**64 + 1, 1))
+        self.assertEqual(NT.is_perfect_power(10**18), (True, 10, 18))
     
     def test_gcd(self):
         gcd_test = NT.gcd(231675,86492)
@@ -81,6 +336,27 @@ class TestNumtheory(TestCase):
     def test_lcm_n(self):
         lcmn_test = NT.lcm_n([8345, 23579, 174])
         self.assertEqual(lcmn_test,34237415370)
+        big = [2**61 - 1, 2**89 - 1, 2**107 - 1, 6, 10]
+        self.assertEqual(NT.lcm_n(big), 30*(2**61 - 1)*(2**89 - 1)*(2**107 - 1))
+        self.assertEqual(NT.lcm_n([7]), 7)
+        self.assertEqual(NT.lcm_n([4, 0]), 0)
+        self.assertEqual(NT.lcm_n([4.0, 6, 10]), 60)
+        self.assertEqual(NT.lcm(4.0, 6), 12)
+        self.assertRaises(EulerlibInputError, NT.lcm, 4.5, 6)
+        self.assertEqual(NT.lcm_range(20), 232792560)
+        self.assertEqual(NT.lcm_range(100), NT.lcm_n(range(1, 101)))
+    
+    def test_batch_gcd(self):
+        p, q, r, s = 2**61 - 1, 2**89 - 1, 2**107 - 1, 2**127 - 1
+        moduli = [p*q, q*r, r*s, 1000003*1000033, p*p*s]
+        self.assertEqual(NT.batch_gcd(moduli), [p*q, q*r, r*s, 1, p*s])
+        self.assertEqual(NT.batch_gcd([15, 77, 221, 35]), [5, 7, 1, 35])
+        moduli = [3**5000 + 2, 3**5001 + 2]
+        moduli.append(moduli[0]*(2**127 - 1))
+        self.assertEqual(NT.batch_gcd(moduli)[1], 
+                         NT.gcd(moduli[1], moduli[0]*moduli[2]))
+        self.assertEqual(NT.batch_gcd([]), [])
+        self.assertRaises(EulerlibInputError, NT.batch_gcd, [3, 0])
     
     def test_nCr(self):
         nCr_test = NT.nCr(45,7)
@@ -89,6 +365,33 @@ class TestNumtheory(TestCase):
     def test_nPr(self):
         nPr_test = NT.nPr(45,7)
         self.assertEqual(nPr_test,228713284800)
+        self.assertEqual(NT.nPr(10**20, 2), 10**40 - 10**20)
+        self.assertEqual(NT.nPr(10.0, 3), 720)
+        self.assertEqual(NT.nCr(10.0, 3.0), 120)
+        self.assertRaises(EulerlibInputError, NT.nCr, 10.5, 3)
+    
+    def test_nCr_exact(self):
+        self.assertEqual(NT.nCr(100, 50), 100891344545564193334812497256)
+        self.assertEqual(NT.nCr(10**20, 3), 
+                         10**20*(10**20 - 1)*(10**20 - 2)//6)
+        big = NT.nCr(3000, 1400)
+        self.assertEqual(big, NT.nCr(2999, 1399) + NT.nCr(2999, 1400))
+        self.assertEqual(NT.nCr(5, 6), 0)
+        
+    def test_binomial_mod(self):
+        myBin = NT.BinomialMod(1000)
+        self.assertEqual(myBin.nCr(1000, 500), NT.nCr(1000, 500) % (10**9+7))
+        self.assertEqual(myBin.nPr(1000, 7), NT.nPr(1000, 7) % (10**9+7))
+        self.assertEqual(myBin.nCr(5000, 2500), NT.nCr(5000, 2500) % (10**9+7))
+        myBin = NT.BinomialMod(20, 13)
+        for (n, r) in ((1000, 300), (2028, 1014), (169, 13)):
+            self.assertEqual(myBin.nCr(n, r), NT.nCr(n, r) % 13)
+        for modulus in (3**5, 2**10, 10**6, 1001):
+            myBin = NT.BinomialMod(10, modulus)
+            for (n, r) in ((1000, 300), (2048, 1024), (3**7, 3**5 + 1)):
+                self.assertEqual(myBin.nCr(n, r), NT.nCr(n, r) % modulus)
+                self.assertEqual(myBin.nPr(n, r), NT.nPr(n, r) % modulus)
+        self.assertRaises(EulerlibInputError, NT.BinomialMod, 10, 1)
     
     def test_digital_sum(self):
         test_dsum = NT.digital_sum(228713284800)
@@ -115,6 +418,250 @@ class TestNumtheory(TestCase):
         div14688 = myDiv.divisors(14688)
         self.assertEqual(len(div14688),sf14688[0])
         self.assertEqual(sum(div14688),sf14688[1])
+    
+    def test_spf_table(self):
+        spf = NT.spf_table(100)
+        self.assertEqual(len(spf), 101)
+        self.assertEqual([spf[n] for n in [1, 2, 9, 49, 91, 97, 100]],
+                         [1, 2, 3, 7, 7, 97, 2])
+    
+    def test_divisors_spf(self):
+        myDiv = NT.Divisors(100000)
+        spfDiv = NT.Divisors(100000, spf=True)
+        for num in list(range(-1, 2000)) + [14688, 65536, 99991, 99990]:
+            self.assertEqual(spfDiv.prime_factors(num), 
+                             myDiv.prime_factors(num))
+            self.assertEqual(spfDiv.prime_factors_only(num), 
+                             myDiv.prime_factors_only(num))
+        self.assertEqual(spfDiv.sigma_function(14688), (48, 45360, 30672))
+        self.assertEqual(spfDiv.phi(60), 16)
+        self.assertEqual(spfDiv.prime_factors(100001), [(11, 1), (9091, 1)])
+    
+    def test_multiplicative_tables(self):
+        myDiv = NT.Divisors(1000)
+        phi = NT.totient_table(1000)
+        mu = NT.mobius_table(1000)
+        sigma0 = NT.num_divisors_table(1000)
+        sigma1 = NT.sigma_table(1000)
+        sigma2 = NT.sigma_table(1000, 2)
+        for num in range(1, 1001):
+            divs = myDiv.divisors(num)
+            self.assertEqual(phi[num], myDiv.phi(num))
+            self.assertEqual(sigma0[num], len(divs))
+            self.assertEqual(sigma1[num], sum(divs))
+            self.assertEqual(sigma2[num], sum([d*d for d in divs]))
+        self.assertEqual(list(mu[:11]), [0, 1, -1, -1, 0, -1, 1, -1, 0, 0, 1])
+        self.assertEqual(sum(mu), 2)
+        self.assertEqual(list(NT.totient_table(0)), [0])
+    
+    def test_summatory_functions(self):
+        phi = NT.totient_table(1000)
+        mu = NT.mobius_table(1000)
+        self.assertEqual(NT.totient_sum(1000), sum(phi))
+        self.assertEqual(NT.mertens(1000), sum(mu))
+        self.assertEqual(NT.totient_sum(10**7), 30396356427242)
+        self.assertEqual(NT.mertens(10**7), 1037)
+        self.assertEqual(NT.num_divisors_sum(1000), 
+                         sum(NT.num_divisors_table(1000)))
+        self.assertEqual(NT.num_divisors_sum(10**10), 231802823220)
+        self.assertEqual(NT.sigma_sum(1000), sum(NT.sigma_table(1000)))
+        self.assertEqual(NT.sigma_sum(1000, 2), sum(NT.sigma_table(1000, 2)))
+        self.assertEqual(NT.totient_sum(0), 0)
+        self.assertEqual(NT.mertens(1), 1)
+    
+    def test_factorint(self):
+        self.assertEqual(NT.factorint(1), [])
+        self.assertEqual(NT.factorint(840), [(2, 3), (3, 1), (5, 1), (7, 1)])
+        self.assertEqual(NT.factorint(2**64 + 1), 
+                         [(274177, 1), (67280421310721, 1)])
+        self.assertEqual(NT.factorint((2**31 - 1)**2*(2**61 - 1)),
+                         [(2**31 - 1, 2), (2**61 - 1, 1)])
+        # Needs ECM: a 13 digit factor and a 27 digit factor
+        self.assertEqual(NT.factorint(946395033253*178152504025188242649239629),
+                         [(946395033253, 1), (178152504025188242649239629, 1)])
+        myDiv = NT.Divisors(1000)
+        self.assertEqual(myDiv.prime_factors(10**20 + 1),
+                         [(73, 1), (137, 1), (1676321, 1), (5964848081, 1)])
+        self.assertEqual(myDiv.prime_factors_only(2**64 + 1),
+                         [274177, 67280421310721])
+        self.assertEqual(myDiv.sigma_function(1000003), (2, 1000004, 1))
+        self.assertEqual(len(myDiv.divisors(10**20 + 1)), 16)
+        self.assertEqual(myDiv.phi(2**64 + 1), 
+                         274176*67280421310720)
+    
+    def test_divisors_prime_table(self):
+        myDiv = NT.Divisors(100000, prime_table=P.PrimeTable(100000))
+        self.assertEqual(myDiv.prime_factors(99990),
+                         [(2, 1), (3, 2), (5, 1), (11, 1), (101, 1)])
+        self.assertEqual(myDiv.sigma_function(99991), (2, 99992, 1))
+        self.assertRaises(EulerlibInputError, NT.Divisors, 1000, 
+                          P.PrimeTable(100))
+    
+    def test_factor_many(self):
+        values = list(range(-2, 3000)) + [10**12 + 39, 2**64 + 1, 999983**2]
+        expected = [NT.factorint(v) for v in values]
+        self.assertEqual(list(NT.factor_many(values, limit=1000)), expected)
+        self.assertEqual(list(NT.factor_many(iter(values), workers=2, 
+                                             chunksize=100, limit=1000)),
+                         expected)
+        self.assertEqual(list(NT.factor_many([], workers=2)), [])
+        self.assertRaises(EulerlibInputError, list, 
+                          NT.factor_many(values, chunksize=0))
+    
+    def test_divisors_snapshot(self):
+        myDiv = NT.Divisors(10000, spf=True, 
+                            cache_policy={"divisors_table": {"max_entries": 5}})
+        for num in (360, 9973, 2**64 + 1, 10**30, 5040):
+            myDiv.sigma_function(num)
+            myDiv.prime_factors_only(num)
+            myDiv.divisors(num)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            myDiv.save(path)
+            for use_mmap in (True, False):
+                loaded = NT.Divisors.load(path, use_mmap)
+                for name in ("sigma_table", "primefact_table", 
+                             "pfactonly_table", "divisors_table"):
+                    self.assertEqual(list(getattr(loaded, name).items()),
+                                     list(getattr(myDiv, name).items()))
+                self.assertEqual(loaded.divisors_table.max_entries, 5)
+                self.assertEqual(list(loaded.spf_table), 
+                                 list(myDiv.spf_table))
+                self.assertEqual(loaded.prime_factors(9999), 
+                                 [(3, 2), (11, 1), (101, 1)])
+                self.assertEqual(loaded.phi(9973), 9972)
+                loaded.close()
+                self.assertEqual(loaded.sigma_function(9991), (4, 10192, 201))
+            with open(path, "r+b") as f:
+                f.seek(100)
+                byte = f.read(1)
+                f.seek(100)
+                f.write(bytes([byte[0] ^ 1]))
+            self.assertRaises(EulerlibInputError, NT.Divisors.load, path)
+            with open(path, "wb") as f:
+                f.write(b"EULDIVS\x00" + bytes(100))
+            self.assertRaises(EulerlibInputError, NT.Divisors.load, path)
+            open(path, "wb").close()
+            self.assertRaises(EulerlibInputError, NT.Divisors.load, path)
+        finally:
+            os.remove(path)
+    
+    def test_divisor_gen(self):
+        myDiv = NT.Divisors(1000)
+        all360 = myDiv.divisors(360)
+        self.assertEqual(sorted(myDiv.divisor_gen(360)), all360)
+        self.assertEqual(list(myDiv.divisor_gen(360, sort=True)), all360)
+        self.assertEqual(list(myDiv.divisor_gen(360, 10, 40, sort=True)),
+                         [10, 12, 15, 18, 20, 24, 30, 36, 40])
+        self.assertEqual(sorted(myDiv.divisor_gen(360, hi=18)), 
+                         [1, 2, 3, 4, 5, 6, 8, 9, 10, 12, 15, 18])
+        self.assertEqual(sorted(myDiv.unitary_divisor_gen(360)),
+                         [1, 5, 8, 9, 40, 45, 72, 360])
+        hcn = 897612484786617600
+        self.assertEqual(myDiv.num_divisors(hcn), 103680)
+        self.assertEqual(sum(1 for d in myDiv.divisor_gen(hcn, hi=10**6)),
+                         sum(1 for d in myDiv.divisor_gen(hcn, hi=10**6, 
+                                                          sort=True)))
+        self.assertEqual(myDiv.num_divisors(360, unitary=True), 8)
+        self.assertEqual(myDiv.divisor_sum(360), 1170)
+        self.assertEqual(myDiv.divisor_sum(360, 2), 
+                         sum(d*d for d in all360))
+        self.assertEqual(myDiv.divisor_sum(360, unitary=True), 540)
+        self.assertEqual(list(myDiv.divisor_gen(0)), [])
+    
+    def test_divisors_cache_policy(self):
+        myDiv = NT.Divisors(1000, cache_policy={
+            "divisors_table": {"max_entries": 10},
+            "sigma_table": {"max_bytes": 2000},
+            "pfactonly_table": {"max_entries": 0}})
+        for num in range(1, 101):
+            myDiv.divisors(num)
+            myDiv.sigma_function(num)
+            myDiv.prime_factors_only(num)
+        self.assertEqual(myDiv.divisors(100), [1,2,4,5,10,20,25,50,100])
+        self.assertEqual(myDiv.divisors(12), [1,2,3,4,6,12])
+        stats = myDiv.cache_stats()
+        self.assertEqual(stats["divisors_table"]["entries"], 10)
+        self.assertEqual(stats["divisors_table"]["hits"], 1)
+        self.assertEqual(stats["divisors_table"]["evictions"], 90)
+        self.assertTrue(stats["sigma_table"]["bytes"] <= 2000)
+        self.assertTrue(stats["sigma_table"]["evictions"] > 0)
+        self.assertEqual(stats["pfactonly_table"]["entries"], 0)
+        self.assertEqual(myDiv.prime_factors_only(60), [2, 3, 5])
+        for num in (360, 97, 360, 97):
+            test_divs = myDiv.divisors(num)
+            test_divs.append(-1)
+        self.assertEqual(myDiv.divisors(360)[-1], 360)
+        self.assertEqual(myDiv.divisors(97), [1, 97])
+        self.assertEqual(list(myDiv.divisors_table.keys())[-1], 97)
+        del myDiv.divisors_table[97]
+        self.assertFalse(97 in myDiv.divisors_table)
+        self.assertEqual(myDiv.divisors_table.pop(360)[-1], 360)
+        test_cache = NT._LRUCache(max_entries=2)
+        test_cache[1] = "a"
+        test_cache[2] = "b"
+        test_cache[1] = "a2"
+        test_cache[3] = "c"
+        self.assertEqual(dict(test_cache), {1: "a2", 3: "c"})
+        self.assertRaises(EulerlibInputError, myDiv.set_cache_policy, 
+                          "phi_table")
+    
+    def test_divisors_auto_extend(self):
+        myDiv = NT.Divisors(100, spf=True, auto_extend=True, max_limit=5000)
+        myDiv.sigma_function(36)
+        self.assertEqual(myDiv.prime_factors(1001), [(7, 1), (11, 1), (13, 1)])
+        self.assertEqual(myDiv.limit, 1001)
+        self.assertEqual(list(myDiv.spf_table), list(NT.spf_table(1001)))
+        self.assertEqual(myDiv.primes_table, P.primes(1001))
+        self.assertEqual(myDiv.divisors(1009), [1, 1009])
+        self.assertEqual(myDiv.limit, 2002)
+        self.assertEqual(myDiv.cache_stats()["sigma_table"]["entries"], 1)
+        self.assertEqual(myDiv.phi(10007), 10006)
+        self.assertEqual(myDiv.limit, 2002)
+        myDiv = NT.Divisors(10, prime_table=P.PrimeTable(100))
+        myDiv.extend(1000)
+        self.assertEqual(myDiv.primes_table, P.primes(1000))
+        self.assertEqual(myDiv.sigma_function(997), (2, 998, 1))
+
+class TestModular(TestCase):
+    def test_inverse(self):
+        self.assertEqual(MOD.egcd(240, 46), (2, -9, 47))
+        self.assertEqual(MOD.mod_inverse(3, 11), 4)
+        self.assertRaises(EulerlibInputError, MOD.mod_inverse, 6, 9)
+        values = [2, 3, 10**12, 7**40]
+        self.assertEqual(MOD.mod_inverse_many(values, 10**9 + 7),
+                         [MOD.mod_inverse(v, 10**9 + 7) for v in values])
+        self.assertRaises(EulerlibInputError, MOD.mod_inverse_many, 
+                          [2, 3], 9)
+    
+    def test_crt(self):
+        self.assertEqual(MOD.crt([2, 3, 2], [3, 5, 7]), (23, 105))
+        self.assertEqual(MOD.crt([1, 3], [4, 6]), (9, 12))
+        self.assertEqual(MOD.crt([1, 2], [4, 6]), None)
+        self.assertEqual(MOD.crt_many([[2, 3, 2], [0, 0, 1]], [3, 5, 7]),
+                         [23, 15])
+        self.assertRaises(EulerlibInputError, MOD.crt_many, [[1, 1]], [4, 6])
+    
+    def test_order_and_roots(self):
+        self.assertEqual(MOD.multiplicative_order(10, 7), 6)
+        self.assertEqual(MOD.multiplicative_order(2, 2**61 - 1), 61)
+        self.assertEqual(MOD.carmichael(5040), 12)
+        self.assertEqual(MOD.primitive_root(10**9 + 7), 5)
+        self.assertEqual(MOD.primitive_root(2*3**5), 5)
+        self.assertEqual(MOD.primitive_root(15), None)
+        myDiv = NT.Divisors(1000)
+        self.assertEqual(MOD.multiplicative_order(3, 1000, myDiv), 100)
+        self.assertTrue(1000 in myDiv.primefact_table)
+    
+    def test_discrete_log(self):
+        self.assertEqual(MOD.discrete_log(3, 13, 17), 4)
+        self.assertEqual(MOD.discrete_log(2, 3, 7), None)
+        p = 10**9 + 7
+        self.assertEqual(pow(5, MOD.discrete_log(5, 123456789, p), p), 
+                         123456789)
+        self.assertEqual(MOD.discrete_log(3, pow(3, 123456, 2**20), 2**20),
+                         123456 % MOD.multiplicative_order(3, 2**20))
 
 class TestEtc(TestCase):
     def test_dec_to_base(self):
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2015 Sameer Suhas Marathe
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+.. module:: eulerlib.aio
+    :synopsis: Prime numbers generation for asyncio applications.
+
+.. moduleauthor:: Sameer Marathe
+
+This module is not imported by :mod:`eulerlib` itself. Import it 
+explicitly::
+
+    from eulerlib.aio import aprime_gen
+"""
+
+__all__ = ["aprime_gen"]
+
+import asyncio
+from collections import deque
+
+from ._exceptions import EulerlibInputError
+from .prime_numbers import _isqrt, _small_primes, _sieve_window
+
+
+async def aprime_gen(start=2,stop=None,chunk=1 << 18,prefetch=1,
+                     executor=None):
+    """An asynchronous generator function that yields lists of the prime 
+    numbers p such that start <= p <= stop, in ascending order.
+    
+    :param start: Lower limit (inclusive). (default = 2)
+    :param stop: Upper limit (inclusive) or *None* for no limit. 
+                 (default = None)
+    :param chunk: Width of the range of numbers sieved for each list.
+                  (default = 2**18)
+    :param prefetch: Number of chunks sieved ahead of the consumer.
+                     (default = 1)
+    :param executor: A :class:`concurrent.futures.Executor` in which the 
+                     chunks are sieved, or *None* for the default executor of
+                     the event loop. (default = None)
+    
+    The sieving runs in the executor, so the event loop is never blocked by
+    more than the handling of one list. At most *prefetch* chunks are sieved
+    ahead of the consumer, which bounds memory use when the consumer is 
+    slow. Closing or cancelling the consumer cancels the chunks that have 
+    not started yet.
+    
+    For example::
+    
+        async for chunk in aprime_gen(10**12, 10**12 + 10**7):
+            for p in chunk:
+                ...
+    """
+    if chunk < 1 or prefetch < 0:
+        raise EulerlibInputError('aio','aprime_gen',
+                                 'chunk should be positive and prefetch '
+                                 'should not be negative')
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    base_primes = []
+    base_limit = 1
+    lo = start
+    try:
+        while True:
+            while (len(pending) <= prefetch and 
+                   (stop is None or lo <= stop)):
+                hi = lo + chunk - 1
+                if stop is not None:
+                    hi = min(hi, stop)
+                if (base_limit + 1)**2 <= hi:
+                    # Base primes for this chunk and the ones that follow.
+                    base_limit = _isqrt(4*hi if stop is None else stop)
+                    base_primes = await loop.run_in_executor(
+                        executor, _small_primes, base_limit)
+                pending.append(loop.run_in_executor(executor, _sieve_window,
+                                                    lo, hi + 1, base_primes))
+                lo = hi + 1
+            if not pending:
+                break
+            result = await pending.popleft()
+            if result:
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+#   Copyright 2015 Sameer Suhas Marathe
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+.. module:: eulerlib.modular
+    :synopsis: Modular arithmetic functions.
+
+.. moduleauthor:: Sameer Marathe
+
+Functions that need the factorization of a modulus accept an optional
+:class:`eulerlib.numtheory.Divisors` instance (*divisors*) and then use its
+memo tables. Without it, factorizations computed with
+:func:`eulerlib.numtheory.factorint` are kept in a small module-level cache,
+so repeated calls with the same modulus factor it only once.
+"""
+
+__all__ = ["egcd", "mod_inverse", "mod_inverse_many", "crt", "crt_many",
+           "carmichael", "multiplicative_order", "primitive_root",
+           "discrete_log"]
+
+from ._exceptions import EulerlibInputError
+from .numtheory import factorint, _LRUCache
+from .prime_numbers import _isqrt
+
+#: Factorizations of moduli (and of p - 1) computed without a *divisors*
+#: argument, least recently used first.
+_factor_cache = _LRUCache(max_entries=4096)
+
+
+def _factor(num, divisors):
+    """Returns the prime factorization [(p1,a1),...] of *num* from
+    *divisors* or from the module-level cache."""
+    if divisors is not None:
+        return divisors.prime_factors(num)
+    result = _factor_cache.get(num)
+    if result is None:
+        result = factorint(num)
+        _factor_cache[num] = result
+    return result
+
+
+def egcd(a,b):
+    """`Extended Euclidean algorithm
+    <http://en.wikipedia.org/wiki/Extended_Euclidean_algorithm>`_.
+
+    :param a: First integer
+    :param b: Second integer
+    :returns: A tuple (g,x,y) such that a*x + b*y = g = GCD(a,b) >= 0
+    """
+    (r0, r1) = (a, b)
+    (s0, s1) = (1, 0)
+    (t0, t1) = (0, 1)
+    while r1:
+        q = r0//r1
+        (r0, r1) = (r1, r0 - q*r1)
+        (s0, s1) = (s1, s0 - q*s1)
+        (t0, t1) = (t1, t0 - q*t1)
+    if r0 < 0:
+        return (-r0, -s0, -t0)
+    return (r0, s0, t0)
+
+
+def mod_inverse(a,m):
+    """Returns the inverse of *a* modulo *m*.
+
+    :param a: An integer coprime to *m*
+    :param m: Modulus (> 1)
+    :returns: The integer 0 < x < m such that a*x = 1 (mod m)
+    """
+    (g, x, y) = egcd(a % m, m)
+    if g != 1:
+        raise EulerlibInputError('modular','mod_inverse',
+                                 '{0} is not invertible modulo {1}'.format(
+                                 a, m))
+    return x % m
+
+
+def mod_inverse_many(values,m):
+    """Batch modular inversion: returns the inverses of all *values* modulo
+    *m* with a single extended GCD (`Montgomery's trick`).
+
+    :param values: A list (or iterable) of integers coprime to *m*
+    :param m: Modulus (> 1)
+    :returns: A list of the inverses, in the order of *values*.
+
+    The prefix products of *values* are inverted once and the individual
+    inverses are recovered with three multiplications each.
+    """
+    values = [v % m for v in values]
+    prefix = [1]*(len(values) + 1)
+    acc = 1
+    for (i, v) in enumerate(values):
+        acc = acc*v % m
+        prefix[i+1] = acc
+    try:
+        inv = mod_inverse(acc, m)
+    except EulerlibInputError:
+        for v in values:
+            if egcd(v, m)[0] != 1:
+                raise EulerlibInputError('modular','mod_inverse_many',
+                    '{0} is not invertible modulo {1}'.format(v, m))
+        raise
+    result = [0]*len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = inv*prefix[i] % m
+        inv = inv*values[i] % m
+    return result
+
+
+def crt(residues,moduli):
+    """Solves a system of congruences x = r :sub:`i` (mod m :sub:`i`) with
+    the `Chinese remainder theorem
+    <http://en.wikipedia.org/wiki/Chinese_remainder_theorem>`_.
+
+    :param residues: A list of integers [r1,r2,...,rn]
+    :param moduli: A list of positive integers [m1,m2,...,mn], not
+                   necessarily coprime
+    :returns: A tuple (x,M) where M = LCM(m1,...,mn) and 0 <= x < M is the
+              unique solution modulo M, or *None* if the congruences are
+              inconsistent.
+
+    For example::
+
+        >>> crt([2, 3, 2], [3, 5, 7])
+        (23, 105)
+    """
+    (x, M) = (0, 1)
+    for (r, m) in zip(residues, moduli):
+        (g, p, q) = egcd(M, m)
+        if (r - x) % g:
+            return None
+        x += M*((r - x)//g*p % (m//g))
+        M = M//g*m
+        x %= M
+    return (x, M)
+
+
+def crt_many(residues,moduli):
+    """Vectorized Chinese remainder theorem: solves many systems of
+    congruences that share the same pairwise coprime *moduli*.
+
+    :param residues: An iterable of lists [r1,r2,...,rn], one per system
+    :param moduli: A list of pairwise coprime positive integers
+                   [m1,m2,...,mn]
+    :returns: A list of the solutions 0 <= x < m1*m2*...*mn, one per system.
+
+    The basis e :sub:`i` = (M/m :sub:`i`) * (inverse of M/m :sub:`i` modulo
+    m :sub:`i`) is computed once, so each system costs n multiplications.
+    """
+    moduli = list(moduli)
+    M = 1
+    for m in moduli:
+        M *= m
+    basis = []
+    for m in moduli:
+        Mi = M//m
+        try:
+            basis.append(Mi*mod_inverse(Mi, m))
+        except EulerlibInputError:
+            raise EulerlibInputError('modular','crt_many',
+                                     'moduli must be pairwise coprime')
+    return [sum([r*e for (r, e) in zip(row, basis)]) % M
+            for row in residues]
+
+
+def _carmichael(m, divisors):
+    """Returns (lambda(m), factorization of lambda(m) as a dictionary)."""
+    factors = {}
+    for (p, a) in _factor(m, divisors):
+        if p == 2:
+            part = {2: 1 if a < 3 else a - 2} if a > 1 else {}
+        else:
+            part = dict(_factor(p - 1, divisors))
+            if a > 1:
+                part[p] = a - 1
+        for (q, e) in part.items():
+            if e > factors.get(q, 0):
+                factors[q] = e
+    lam = 1
+    for (q, e) in factors.items():
+        lam *= q**e
+    return (lam, factors)
+
+
+def carmichael(m,divisors=None):
+    """Returns the `Carmichael function
+    <http://en.wikipedia.org/wiki/Carmichael_function>`_ lambda(*m*), the
+    exponent of the multiplicative group modulo *m*.
+
+    :param m: A positive integer
+    :param divisors: Optional :class:`eulerlib.numtheory.Divisors` used to
+                     factor *m* and p - 1. (default = None)
+    """
+    if m < 1:
+        raise EulerlibInputError('modular','carmichael',
+                                 'm must be positive')
+    return _carmichael(m, divisors)[0]
+
+
+def multiplicative_order(a,m,divisors=None):
+    """Returns the `multiplicative order
+    <http://en.wikipedia.org/wiki/Multiplicative_order>`_ of *a* modulo *m*,
+    the smallest k > 0 such that a**k = 1 (mod m).
+
+    :param a: An integer coprime to *m*
+    :param m: Modulus (> 1)
+    :param divisors: Optional :class:`eulerlib.numtheory.Divisors` used to
+                     factor *m* and p - 1. (default = None)
+
+    Starts from the Carmichael function lambda(*m*) and removes its prime
+    factors while a power of *a* remains 1.
+    """
+    if m < 2 or egcd(a, m)[0] != 1:
+        raise EulerlibInputError('modular','multiplicative_order',
+                                 'a must be coprime to m > 1')
+    (order, factors) = _carmichael(m, divisors)
+    for q in factors:
+        while order % q == 0 and pow(a, order//q, m) == 1:
+            order //= q
+    return order
+
+
+def primitive_root(m,divisors=None):
+    """Returns the smallest `primitive root
+    <http://en.wikipedia.org/wiki/Primitive_root_modulo_n>`_ modulo *m*.
+
+    :param m: Modulus (> 1)
+    :param divisors: Optional :class:`eulerlib.numtheory.Divisors` used to
+                     factor *m* and p - 1. (default = None)
+    :returns: The smallest generator of the multiplicative group modulo
+              *m*, or *None* if the group is not cyclic (*m* is not 2, 4,
+              p**k or 2*p**k for an odd prime p).
+    """
+    if m < 2:
+        raise EulerlibInputError('modular','primitive_root',
+                                 'm must be greater than 1')
+    if m < 5:
+        return m - 1
+    factors = _factor(m, divisors)
+    odd = [(p, a) for (p, a) in factors if p != 2]
+    if len(odd) != 1 or m % 4 == 0:
+        return None
+    (p, a) = odd[0]
+    phi = p**(a - 1)*(p - 1)
+    exponents = [phi//q for (q, e) in _factor(p - 1, divisors)]
+    if a > 1:
+        exponents.append(phi//p)
+    for g in range(2, m):
+        if g % p == 0 or g % 2 == 0 and m % 2 == 0:
+            continue
+        for k in exponents:
+            if pow(g, k, m) == 1:
+                break
+        else:
+            return g
+    return None
+
+
+def _bsgs(g, h, order, m):
+    """Baby-step giant-step: returns 0 <= x < order with g**x = h (mod m),
+    or *None*."""
+    s = _isqrt(order - 1) + 1
+    table = {}
+    e = 1
+    for j in range(s):
+        if e not in table:
+            table[e] = j
+        e = e*g % m
+    factor = mod_inverse(e, m)
+    gamma = h % m
+    for i in range(s):
+        j = table.get(gamma)
+        if j is not None:
+            return i*s + j
+        gamma = gamma*factor % m
+    return None
+
+
+def discrete_log(a,b,m,divisors=None):
+    """Solves a**x = b (mod m) for x: the `discrete logarithm
+    <http://en.wikipedia.org/wiki/Discrete_logarithm>`_ of *b* to the base
+    *a*.
+
+    :param a: Base, coprime to *m*
+    :param b: An integer
+    :param m: Modulus (> 1)
+    :param divisors: Optional :class:`eulerlib.numtheory.Divisors` used to
+                     factor *m* and p - 1. (default = None)
+    :returns: The smallest x >= 0 such that a**x = b (mod m), or *None* if
+              there is no solution.
+
+    For example::
+
+        >>> discrete_log(3, 13, 17)
+        4
+
+    Uses the `Pohlig-Hellman algorithm
+    <http://en.wikipedia.org/wiki/Pohlig%E2%80%93Hellman_algorithm>`_ on the
+    factorization of the order n of *a*: each prime power q**e of n needs e
+    `baby-step giant-step
+    <http://en.wikipedia.org/wiki/Baby-step_giant-step>`_ searches in a
+    group of order q, which take O(sqrt(q)) time and memory.
+    """
+    order = multiplicative_order(a, m, divisors)
+    b %= m
+    if egcd(b, m)[0] != 1:
+        return None
+    (residues, moduli) = ([], [])
+    for (q, e) in _factor(order, divisors):
+        qe = q**e
+        aq = pow(a, order//qe, m)
+        bq = pow(b, order//qe, m)
+        gamma = pow(aq, qe//q, m)
+        aq_inv = mod_inverse(aq, m)
+        x = 0
+        qk = 1
+        for k in range(e):
+            h = pow(pow(aq_inv, x, m)*bq % m, qe//(qk*q), m)
+            d = _bsgs(gamma, h, q, m)
+            if d is None:
+                return None
+            x += d*qk
+            qk *= q
+        residues.append(x)
+        moduli.append(qe)
+    x = crt(residues, moduli)[0]
+    if pow(a, x, m) != b:
+        return None
+    return x
@@ -21,13 +21,78 @@
 
 """
 
-__all__ = ["is_square", "gcd", "lcm", "lcm_n", "nCr", "nPr", "digital_sum",
-           "digital_root","Divisors"]
-      
-from .prime_numbers import primes
+__all__ = ["isqrt", "is_square", "is_square_many", "iroot", 
+           "is_perfect_power", "gcd", "lcm", "lcm_n", "lcm_range", 
+           "batch_gcd", "nCr", "nPr", "BinomialMod", "digital_sum", 
+           "digital_root", "spf_table", "totient_table", "mobius_table",
+           "num_divisors_table", "sigma_table", "totient_sum", "mertens",
+           "num_divisors_sum", "sigma_sum", "factorint", "factor_many",
+           "Divisors"]
+
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping
+from heapq import heappush, heappop
+from itertools import accumulate, islice
+from math import gcd as _gcd
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import zlib
+from .prime_numbers import primes, primes_in_range, is_prime, _isqrt
+from .prime_numbers import PrimeTable, _pack_flags, _bitmap_size, _as_int
+from .prime_numbers import _TRIAL_PRIMES, _TRIAL_PRODUCT, _power_sum_poly
+from ._exceptions import EulerlibInputError
+
+#: Quadratic residue flags modulo 64, 63, 65 and 11. Together they reject
+#: all but about 1 in 150 non-squares before a square root is computed.
+_SQUARE_RESIDUES = {}
+for _m in (64, 63, 65, 11):
+    _SQUARE_RESIDUES[_m] = bytearray(_m)
+    for _i in range(_m):
+        _SQUARE_RESIDUES[_m][_i*_i % _m] = 1
+_SQ64 = _SQUARE_RESIDUES[64]
+_SQ63 = _SQUARE_RESIDUES[63]
+_SQ65 = _SQUARE_RESIDUES[65]
+_SQ11 = _SQUARE_RESIDUES[11]
+del _m, _i
+
+
+def isqrt(num):
+    """Returns the integer square root of a non-negative integer *num*, the
+    largest integer *root* such that root**2 <= num.
+    
+    :param num: A non-negative integer
+    :returns: floor(sqrt(*num*))
+    
+    Uses :func:`math.isqrt` where available and Newton's method on integers
+    otherwise.
+    """
+    if num < 0:
+        raise EulerlibInputError('numtheory','isqrt',
+                                 'num must be non-negative')
+    return _isqrt(num)
+
+
+def _is_square(num):
+    """Returns *True* if the integer *num* is a perfect square. Most 
+    non-squares are rejected by the residue tables before the square root
+    is computed."""
+    if num < 0 or not _SQ64[num & 63]:
+        return False
+    r = num % 45045  # 63*65*11
+    if not (_SQ63[r % 63] and _SQ65[r % 65] and _SQ11[r % 11]):
+        return False
+    root = _isqrt(num)
+    return root*root == num
+
 
 def is_square(num):
-    """Determines if a positive integer *num* is the perfect square.
+    """Determines if a non-negative integer *num* is the perfect square.
     
     :param num: Integer to be checked
     :returns: A tuple (is_square,root)
@@ -37,35 +102,149 @@ def is_square(num):
        * *is_square* is *True* if *num* is a perfect square. 
        * The integer *root* <= (square root of *num*).
     
-    Uses `Digit-by-digit algorithm 
-    <http://en.wikipedia.org/wiki/Methods_of_computing_square_roots#Digit-by-
-    digit_calculation>`_ in base 10.
+    Uses :func:`eulerlib.numtheory.isqrt`. To test many numbers without
+    computing their roots, use :func:`eulerlib.numtheory.is_square_many`.
+    Negative numbers return (False,0). Integral floats such as 16.0 are 
+    accepted; other non-integers raise 
+    :class:`eulerlib._exceptions.EulerlibInputError`.
     """
-    if(num == 0):
-        pn = 0
-        rn = 1
-    else:
-        z = num
-        test = []
-        while(z !=0):
-            test.append(z%100)
-            z = z//100
-        test.reverse()
-        pn = 0
-        rn = 0
-        for i in range(len(test)):
-            #get an estimate of xn
-            c = 100*rn + test[i]
-            xn = 1
-            while ((20*pn+xn)*xn <= c):
-                xn += 1
-            xn -= 1
-            rn = c - (20*pn+xn)*xn
-            pn = pn*10 + xn
-    if(rn == 0):
-        return (True,pn)
-    else:
-        return (False,pn)
+    num = _as_int(num, 'numtheory', 'is_square')
+    if num < 0:
+        return (False,0)
+    root = _isqrt(num)
+    return (root*root == num, root)
+
+
+def is_square_many(values):
+    """Batch square test: returns a boolean mask that is *True* where the 
+    corresponding value in *values* is a perfect square.
+    
+    :param values: An iterable of integers or a NumPy integer array
+    :returns: A list of booleans, or a NumPy boolean array of the same shape
+              if *values* is a NumPy array.
+    
+    Non-squares are mostly rejected by quadratic residues modulo 64, 63, 65 
+    and 11; only the remaining values need a square root. For example::
+    
+        >>> is_square_many([0, 2, 49, 10**40, 10**40 + 1])
+        [True, False, True, True, False]
+    """
+    if hasattr(values, "dtype"):
+        return _is_square_many_numpy(values)
+    sq64, sq63, sq65, sq11 = _SQ64, _SQ63, _SQ65, _SQ11
+    isqrt_ = _isqrt
+    result = []
+    append = result.append
+    for num in values:
+        if num < 0 or not sq64[num & 63]:
+            append(False)
+            continue
+        r = num % 45045
+        if sq63[r % 63] and sq65[r % 65] and sq11[r % 11]:
+            root = isqrt_(num)
+            append(root*root == num)
+        else:
+            append(False)
+    return result
+
+
+def _is_square_many_numpy(values):
+    """NumPy implementation of :func:`eulerlib.numtheory.is_square_many`.
+    """
+    import numpy as np
+    arr = np.asarray(values)
+    if arr.dtype.kind not in "iu":
+        if arr.dtype.kind != "O":
+            raise EulerlibInputError('numtheory','is_square_many',
+                                     'values must be integers')
+        flat = is_square_many(arr.ravel().tolist())
+        return np.array(flat, dtype=bool).reshape(arr.shape)
+    flat = arr.ravel()
+    mask = flat >= 0
+    nums = flat[mask].astype(np.uint64)
+    tables = dict([(m, np.frombuffer(bytes(t), dtype=np.uint8).astype(bool))
+                   for (m, t) in _SQUARE_RESIDUES.items()])
+    keep = tables[64][(nums & np.uint64(63)).astype(np.intp)]
+    r = (nums % np.uint64(45045)).astype(np.intp)
+    for m in (63, 65, 11):
+        keep &= tables[m][r % m]
+    # Rounding the floating point square root is exact for squares below
+    # 2**64; the product of the root with itself decides.
+    cand = nums[keep]
+    root = np.rint(np.sqrt(cand.astype(np.float64))).astype(np.uint64)
+    keep[keep] = root*root == cand
+    mask[mask] = keep
+    return mask.reshape(arr.shape)
+
+
+def iroot(num,k):
+    """Returns the integer *k*-th root of *num*, the integer *root* with the
+    largest absolute value such that abs(root**k) <= abs(num).
+    
+    :param num: An integer (non-negative if *k* is even)
+    :param k: A positive integer
+    :returns: floor(*num* ** (1/k)) for non-negative *num*
+    
+    Uses Newton's method on integers, starting above the root.
+    """
+    if k < 1:
+        raise EulerlibInputError('numtheory','iroot','k must be positive')
+    if num < 0:
+        if k % 2 == 0:
+            raise EulerlibInputError('numtheory','iroot',
+                                     'num must be non-negative for even k')
+        return -iroot(-num, k)
+    if k == 1 or num < 2:
+        return num
+    if k == 2:
+        return _isqrt(num)
+    if k >= num.bit_length():
+        return 1
+    x = 1 << ((num.bit_length() + k - 1)//k)
+    while True:
+        y = ((k - 1)*x + num//x**(k - 1))//k
+        if y >= x:
+            return x
+        x = y
+
+
+def is_perfect_power(num):
+    """Determines if an integer *num* > 1 is a `perfect power
+    <http://en.wikipedia.org/wiki/Perfect_power>`_ b**e with e > 1.
+    
+    :param num: Integer to be checked
+    :returns: A tuple (is_power,base,exponent) with the largest possible
+              *exponent*; (False,num,1) if *num* is not a perfect power.
+    
+    For example::
+    
+        >>> is_perfect_power(2**12)
+        (True, 2, 12)
+        >>> is_perfect_power(10**12 + 1)
+        (False, 1000000000001, 1)
+    
+    Tries the prime exponents up to log2(*num*), using the square test of
+    :func:`eulerlib.numtheory.is_square_many` for the exponent 2.
+    """
+    if num < 4:
+        return (False,num,1)
+    base = num
+    exponent = 1
+    found = True
+    while found and base > 3:
+        found = False
+        if _is_square(base):
+            root = _isqrt(base)
+            base, exponent, found = root, exponent*2, True
+            continue
+        for k in primes(base.bit_length()):
+            if k == 2:
+                continue
+            root = iroot(base, k)
+            if root**k == base:
+                base, exponent, found = root, exponent*k, True
+                break
+    return (exponent > 1, base, exponent)
 
 
 def gcd(a,b):
@@ -104,33 +283,191 @@ def lcm(a,b):
     :param b: Second integer
     :returns: Least Common Multiple (LCM) of *a* and *b*
     """
-    lcm_ab = 0
-    if a!=0 or b!=0:
-        lcm_ab = abs(a*b)/gcd(a,b)
-    return lcm_ab  
+    a = _as_int(a, 'numtheory', 'lcm')
+    b = _as_int(b, 'numtheory', 'lcm')
+    if a == 0 or b == 0:
+        return 0
+    return abs(a//_gcd(a,b)*b)
+
+
+def _product(values):
+    """Returns the product of a list of integers, multiplying pairs of 
+    similar size (a product tree) so that large products are computed with
+    few big multiplications."""
+    values = list(values)
+    if not values:
+        return 1
+    while len(values) > 1:
+        paired = [values[i]*values[i+1] for i in range(0, len(values) - 1, 2)]
+        if len(values) % 2:
+            paired.append(values[-1])
+        values = paired
+    return values[0]
 
 
 def lcm_n(num_list):
     """Calculate the `Least Common Multiple`_ of a list of 
     integers.
     
-    :param num_list: A list of integers *[i1,i2,i3,...,in]*
-    :returns: LCM of the integers in *num_list*
+    :param num_list: A list (or iterable) of integers *[i1,i2,i3,...,in]*
+    :returns: LCM of the integers in *num_list* (0 if the list is empty or
+              contains 0)
     
-    Uses the associative property LCM(a,b,c) = LCM(*LCM(a,b)*,c)
+    Uses the associative property LCM(a,b,c) = LCM(*LCM(a,b)*,c), combining
+    pairs of partial results of similar size (a tree reduction) instead of
+    folding from left to right.
     """
-    result = 0
-    lennum = len(num_list)
-    if not (lennum <=1 or sum(num_list) == 0):
-        cindex = 1
-        while cindex < lennum:
-            if cindex == 1:
-                curr_lcm = lcm(num_list[cindex-1],num_list[cindex])
-            else:
-                curr_lcm = lcm(curr_lcm,num_list[cindex])
-            cindex += 1
-        result = curr_lcm
-    return result
+    values = [abs(_as_int(num, 'numtheory', 'lcm_n')) for num in num_list]
+    if not values or 0 in values:
+        return 0
+    while len(values) > 1:
+        paired = [lcm(values[i],values[i+1]) 
+                  for i in range(0, len(values) - 1, 2)]
+        if len(values) % 2:
+            paired.append(values[-1])
+        values = paired
+    return values[0]
+
+
+def lcm_range(num):
+    """Returns the `Least Common Multiple`_ of the integers 1, 2, ... *num*.
+    
+    :param num: Upper limit of the range (inclusive)
+    :returns: LCM(1,2,...,num) (1 if *num* < 2)
+    
+    Computed as the product of the largest power of each prime p <= *num* 
+    that does not exceed *num*.
+    """
+    powers = []
+    for p in primes(num):
+        pk = p
+        while pk*p <= num:
+            pk *= p
+        powers.append(pk)
+    return _product(powers)
+
+
+#: Operand size in bits below which the built-in division is used.
+_DIV_LIMIT = 4000
+
+
+def _div2n1n(a, b, n):
+    """Recursive division of a 2n-bit integer *a* by an n-bit integer *b*
+    (Burnikel-Ziegler). Returns (quotient, remainder)."""
+    if a.bit_length() - n <= _DIV_LIMIT:
+        return divmod(a, b)
+    pad = n & 1
+    if pad:
+        a <<= 1
+        b <<= 1
+        n += 1
+    half_n = n >> 1
+    mask = (1 << half_n) - 1
+    b1, b2 = b >> half_n, b & mask
+    q1, r = _div3n2n(a >> n, (a >> half_n) & mask, b, b1, b2, half_n)
+    q2, r = _div3n2n(r, a & mask, b, b1, b2, half_n)
+    if pad:
+        r >>= 1
+    return q1 << half_n | q2, r
+
+
+def _div3n2n(a12, a3, b, b1, b2, n):
+    """Helper of :func:`_div2n1n`: divides a 3n-bit integer, given as its 
+    upper 2n bits *a12* and lower n bits *a3*, by the 2n-bit *b* = b1*2**n +
+    b2."""
+    if a12 >> n == b1:
+        q, r = (1 << n) - 1, a12 - (b1 << n) + b1
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    r = (r << n | a3) - q*b2
+    while r < 0:
+        q -= 1
+        r += b
+    return q, r
+
+
+def _mod(a, b):
+    """Returns a % b for non-negative *a* and positive *b*. Large operands 
+    are divided with :func:`_div2n1n`, whose cost is a few multiplications
+    instead of the quadratic cost of the built-in division."""
+    n = b.bit_length()
+    if n <= _DIV_LIMIT or a.bit_length() <= n + _DIV_LIMIT:
+        return a % b
+    r = 0
+    shift = (a.bit_length() - 1)//n*n
+    mask = (1 << n) - 1
+    while shift >= 0:
+        r = _div2n1n((r << n) | ((a >> shift) & mask), b, n)[1]
+        shift -= n
+    return r
+
+
+def batch_gcd(moduli):
+    """Finds the factors shared between integers of a list: for every 
+    *n* :sub:`i` returns the GCD of *n* :sub:`i` and the product of all the
+    other integers.
+    
+    :param moduli: A list (or iterable) of positive integers 
+                   *[n1,n2,...,nk]*
+    :returns: A list *[g1,g2,...,gk]*. *g* :sub:`i` > 1 if *n* :sub:`i` 
+              shares a factor with another integer of the list.
+    
+    For example::
+    
+        >>> batch_gcd([15, 77, 221, 35])
+        [5, 7, 1, 35]
+    
+    Uses `Bernstein's algorithm <https://cr.yp.to/factorization/smoothparts-
+    20040510.pdf>`_: a product tree of the moduli and a remainder tree of the
+    product modulo *n* :sub:`i` :sup:`2` give all the GCDs with a few big
+    multiplications and divisions per level instead of comparing every 
+    pair. The big integers are handled by `gmpy2 
+    <https://pypi.org/project/gmpy2/>`_ if it is installed; otherwise large
+    divisions use a recursive algorithm, since the built-in division of
+    integers takes quadratic time.
+    """
+    moduli = list(moduli)
+    if not moduli:
+        return []
+    for num in moduli:
+        if num < 1:
+            raise EulerlibInputError('numtheory','batch_gcd',
+                                     'moduli must be positive integers')
+    try:
+        from gmpy2 import mpz
+    except ImportError:
+        values = moduli
+        mod = _mod
+    else:
+        values = [mpz(num) for num in moduli]
+        mod = lambda a, b: a % b
+    tree = [values]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        paired = [level[i]*level[i+1] for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        tree.append(paired)
+    rems = tree.pop()
+    while tree:
+        level = tree.pop()
+        rems = [mod(rems[i >> 1], level[i]*level[i]) 
+                for i in range(len(level))]
+    return [_gcd(int(rem)//num, num) for (rem, num) in zip(rems, moduli)]
+
+
+#: Largest *n* for which :func:`eulerlib.numtheory.nCr` may factor the 
+#: binomial over the primes <= n. Larger *n* use the falling factorial.
+_LEGENDRE_LIMIT = 1 << 24
+
+
+def _legendre(n, p):
+    """Returns the exponent of the prime *p* in n! (Legendre's formula)."""
+    e = 0
+    while n:
+        n //= p
+        e += n
+    return e
 
 
 def nCr(n,r):
@@ -147,16 +484,35 @@ def nCr(n,r):
         members *is not* important in the combination. E.g. There are :sup:`4`   
         C :sub:`2` = 6 ways of selecting two members out of a collection 
         (A, B, C, D) => AB, AC, AD, BC, BD, CD.
+    
+    The result is an exact integer. For large *r* it is computed from the
+    exponent of every prime p <= n in the result (Legendre's formula), and
+    the prime powers are multiplied in a balanced product tree. Smaller *r*
+    use the quotient of the falling factorial and r!. For
+    binomials modulo an integer, see :class:`eulerlib.numtheory.BinomialMod`.
     """
-    result = 0
-    if n >= 0 and r >= 0 and r <= n:
-        num = 1
-        denom = 1
-        for i in range(r):
-            num *= (n-i)
-            denom *= (i+1)
-        result = num/denom
-    return result
+    n = _as_int(n, 'numtheory', 'nCr')
+    r = _as_int(r, 'numtheory', 'nCr')
+    if n < 0 or r < 0 or r > n:
+        return 0
+    r = min(r, n - r)
+    # Unless r is a sizeable fraction of the number of primes <= n, the
+    # falling factorial divided by r! is cheaper than the prime exponents.
+    if n > _LEGENDRE_LIMIT or 11*r*n.bit_length() < n:
+        return _product(range(n - r + 1, n + 1))//_product(range(2, r + 1))
+    m = n - r
+    root = _isqrt(n)
+    powers = []
+    for p in primes(n):
+        if p > root:
+            # Single digit exponent: a carry occurs at most once.
+            if n//p - r//p - m//p:
+                powers.append(p)
+        else:
+            e = _legendre(n, p) - _legendre(r, p) - _legendre(m, p)
+            if e:
+                powers.append(p**e)
+    return _product(powers)
 
 
 def nPr(n,r):
@@ -173,15 +529,15 @@ def nPr(n,r):
         members *is* important in the permutation. E.g. There are :sup:`4` P 
         :sub:`2` = 12 permutations of length 2 out of a collection  
         (A, B, C, D) => AB, AC, AD, BA, BC, BD, CA, CB, CD, DA, DB, DC.
+    
+    The result is an exact integer: the product n(n-1)...(n-r+1) computed
+    in a balanced product tree.
     """
-    result = 0
-    if n >= 0 and r >= 0 and r <= n:
-        num = 1
-        denom = 1
-        for i in range(r):
-            num *= (n-i)
-        result = num/denom
-    return result
+    n = _as_int(n, 'numtheory', 'nPr')
+    r = _as_int(r, 'numtheory', 'nPr')
+    if n < 0 or r < 0 or r > n:
+        return 0
+    return _product(range(n - r + 1, n + 1))
 
 
 def digital_sum(num):
@@ -215,21 +571,1318 @@ def digital_root(num):
     return testnum
 
 
+def spf_table(num):
+    """Returns a table of the smallest prime factor of every integer up to
+    *num*.
+    
+    :param num: Upper limit of the table (inclusive)
+    :returns: An :class:`array.array` *spf* of unsigned integers such that
+              spf[n] is the smallest prime factor of n for 2 <= n <= num
+              (spf[0] = 0 and spf[1] = 1).
+    
+    Sieves with slice assignment, from the largest prime <= sqrt(*num*) 
+    down to 2 so that the smallest prime factor is written last. Every
+    n <= *num* can then be factored with O(log n) table lookups.
+    """
+    num = max(num, 1)
+    spf = array("I", [0])*(num + 1)
+    prime_list = primes(num)
+    root = _isqrt(num)
+    for p in reversed(prime_list[:bisect_left(prime_list, root + 1)]):
+        count = (num - p*p)//p + 1
+        spf[p*p::p] = array("I", [p])*count
+    for p in prime_list:
+        spf[p] = p
+    spf[1] = 1
+    return spf
+
+
+def _multiplicative_table(num, typecode, prime_power_value):
+    """Returns an :class:`array.array` with the values f(0..num) of a 
+    multiplicative function f (f(0) = 0).
+    
+    :param typecode: Type code of the returned array, or *None* for a list.
+    :param prime_power_value: Function (p, q, prev) that returns f(q) for a
+                              prime power q = p**e, given prev = f(q/p).
+    
+    A single pass over the smallest prime factor table: q[i] is the largest
+    power of the smallest prime factor that divides i, so 
+    f(i) = f(q[i])*f(i/q[i]) unless i is itself a prime power.
+    """
+    if num < 1:
+        return [0] if typecode is None else array(typecode, [0])
+    spf = spf_table(num)
+    if typecode is None:
+        table = [0]*(num + 1)
+    else:
+        table = array(typecode, [0])*(num + 1)
+    table[1] = 1
+    pp = array("I", [0])*(num + 1)
+    for i in range(2, num + 1):
+        p = spf[i]
+        m = i // p
+        if spf[m] == p:
+            q = pp[m]*p
+        else:
+            q = p
+        pp[i] = q
+        if q == i:
+            table[i] = prime_power_value(p, q, table[m])
+        else:
+            table[i] = table[q]*table[i // q]
+    return table
+
+
+def totient_table(num):
+    """Returns `Euler's totient function`_ phi(n) for all n <= *num*.
+    
+    :param num: Upper limit of the table (inclusive)
+    :returns: An :class:`array.array` *phi* with phi[n] for 0 <= n <= num
+              (phi[0] = 0).
+    
+    Computed in a single pass over :func:`eulerlib.numtheory.spf_table`.
+    Use it instead of calling :meth:`Divisors.phi` for every n.
+    """
+    return _multiplicative_table(num, "I", lambda p, q, prev: q - q//p)
+
+
+def mobius_table(num):
+    """Returns the `Mobius function 
+    <http://en.wikipedia.org/wiki/M%C3%B6bius_function>`_ mu(n) for all 
+    n <= *num*.
+    
+    :param num: Upper limit of the table (inclusive)
+    :returns: An :class:`array.array` of signed bytes *mu* with mu[n] for
+              0 <= n <= num (mu[0] = 0).
+    """
+    return _multiplicative_table(num, "b", 
+                                 lambda p, q, prev: -1 if q == p else 0)
+
+
+def num_divisors_table(num):
+    """Returns the number of divisors sigma0(n) for all n <= *num*.
+    
+    :param num: Upper limit of the table (inclusive)
+    :returns: An :class:`array.array` *d* with d[n] for 0 <= n <= num 
+              (d[0] = 0).
+    """
+    return _multiplicative_table(num, "I", lambda p, q, prev: prev + 1)
+
+
+def sigma_table(num,k=1):
+    """Returns the `divisor function`_ sigma_k(n) (sum of the *k*-th powers
+    of the divisors of n) for all n <= *num*.
+    
+    :param num: Upper limit of the table (inclusive)
+    :param k: Power of the divisors. (default = 1)
+    :returns: An :class:`array.array` of unsigned 64-bit integers *sigma*
+              with sigma[n] for 0 <= n <= num (sigma[0] = 0). A list is
+              returned if the values may not fit in 64 bits.
+    """
+    if k < 0:
+        raise EulerlibInputError('numtheory','sigma_table',
+                                 'k should be a non-negative integer')
+    # sigma_k(n) < 2*n**k for k >= 2 and < 8*n*log(n) for k = 1
+    typecode = "Q" if 16*max(num, 1)**max(k, 2) < 1 << 64 else None
+    return _multiplicative_table(num, typecode, 
+                                 lambda p, q, prev: prev + q**k)
+
+
+#: Upper bound of the sieved tables used by 
+#: :func:`eulerlib.numtheory.totient_sum` and 
+#: :func:`eulerlib.numtheory.mertens`.
+_SUMMATORY_TABLE_LIMIT = 2*10**7
+
+
+def _summatory(num, small, total):
+    """Returns F(num) for the summatory function F of an arithmetic 
+    function f such that sum of F(v//d) for d = 1..v equals total(v) (the
+    summatory function of f * 1), given F(n) = small[n] for n < len(small).
+    
+    F(v) = total(v) - sum of F(v//d) for d = 2..v is computed for the values
+    v = num//k > len(small) - 1, from the largest k down, grouping the d 
+    with the same quotient v//d below sqrt(v).
+    """
+    limit = len(small) - 1
+    if num <= limit:
+        return small[num]
+    kmax = num//(limit + 1)
+    big = [0]*(kmax + 1)
+    for k in range(kmax, 0, -1):
+        v = num//k
+        r = _isqrt(v)
+        m = v//(r + 1)
+        acc = total(v)
+        for d in range(2, m + 1):
+            kd = k*d
+            if kd <= kmax:
+                acc -= big[kd]
+            else:
+                acc -= small[v//d]
+        hi = v
+        for q in range(1, r + 1):
+            lo = v//(q + 1)
+            acc -= (hi - lo)*small[q]
+            hi = lo
+        big[k] = acc
+    return big[1]
+
+
+def _summatory_limit(num):
+    """Size of the sieved table for a summatory function up to *num*: about
+    num**(2/3), at least sqrt(num)."""
+    return max(min(iroot(num*num, 3), _SUMMATORY_TABLE_LIMIT), 
+               _isqrt(num), 1)
+
+
+def totient_sum(num):
+    """Returns the summatory totient function Phi(*num*), the sum of 
+    `Euler's totient function`_ phi(n) for 1 <= n <= *num*.
+    
+    :param num: Upper limit of the sum (inclusive)
+    :returns: phi(1) + phi(2) + ... + phi(num) (0 if *num* < 1)
+    
+    For example, the `Farey sequence 
+    <http://en.wikipedia.org/wiki/Farey_sequence>`_ of order n has 
+    1 + totient_sum(n) terms::
+    
+        >>> totient_sum(10**6)
+        303963552392
+    
+    Uses phi * 1 = id: the sum of Phi(num//d) over d = 1..num is 
+    num*(num+1)/2. The values below about num**(2/3) are sieved with
+    :func:`eulerlib.numtheory.totient_table` and the others are computed 
+    from them with memoized sums over the distinct quotients num//d, in
+    about O(num**(2/3)) time.
+    """
+    if num < 1:
+        return 0
+    prefix = array("Q", accumulate(totient_table(_summatory_limit(num))))
+    return _summatory(num, prefix, lambda v: v*(v + 1)//2)
+
+
+def mertens(num):
+    """Returns the `Mertens function 
+    <http://en.wikipedia.org/wiki/Mertens_function>`_ M(*num*), the sum of
+    the Mobius function mu(n) for 1 <= n <= *num*.
+    
+    :param num: Upper limit of the sum (inclusive)
+    :returns: mu(1) + mu(2) + ... + mu(num) (0 if *num* < 1)
+    
+    Uses mu * 1 = e: the sum of M(num//d) over d = 1..num is 1. Like 
+    :func:`eulerlib.numtheory.totient_sum`, runs in about O(num**(2/3)) 
+    time.
+    """
+    if num < 1:
+        return 0
+    prefix = array("q", accumulate(mobius_table(_summatory_limit(num))))
+    return _summatory(num, prefix, lambda v: 1)
+
+
+def num_divisors_sum(num):
+    """Returns D(*num*), the sum of the number of divisors sigma0(n) for
+    1 <= n <= *num* (the number of lattice points (x,y) with x*y <= num).
+    
+    :param num: Upper limit of the sum (inclusive)
+    :returns: sigma0(1) + sigma0(2) + ... + sigma0(num) (0 if *num* < 1)
+    
+    Uses the `Dirichlet hyperbola method
+    <http://en.wikipedia.org/wiki/Dirichlet_hyperbola_method>`_:
+    D(num) = 2*(sum of num//d for d <= r) - r**2 with r = isqrt(num), in
+    O(sqrt(num)) time.
+    """
+    if num < 1:
+        return 0
+    r = _isqrt(num)
+    acc = 0
+    for d in range(1, r + 1):
+        acc += num//d
+    return 2*acc - r*r
+
+
+def sigma_sum(num,k=1):
+    """Returns the sum of the `divisor function`_ sigma_k(n) for 
+    1 <= n <= *num*.
+    
+    :param num: Upper limit of the sum (inclusive)
+    :param k: Power of the divisors. (default = 1)
+    :returns: sigma_k(1) + sigma_k(2) + ... + sigma_k(num) (0 if *num* < 1)
+    
+    The sum counts d**k over all pairs (d,e) with d*e <= num. With the 
+    `Dirichlet hyperbola method`_ and r = isqrt(num) it equals the sum over
+    d <= r of d**k*(num//d) + S(num//d), minus r*S(r), where S(m) is the sum
+    of i**k for i <= m (Faulhaber's formula). Runs in O(sqrt(num)) time.
+    """
+    if k < 0:
+        raise EulerlibInputError('numtheory','sigma_sum',
+                                 'k should be a non-negative integer')
+    if num < 1:
+        return 0
+    (coeffs, denom) = _power_sum_poly(k)
+    
+    def power_sum(m):
+        acc = 0
+        for c in reversed(coeffs):
+            acc = acc*m + c
+        return acc//denom
+    
+    r = _isqrt(num)
+    acc = 0
+    for d in range(1, r + 1):
+        q = num//d
+        acc += d**k*q + power_sum(q)
+    return acc - r*power_sum(r)
+
+
+def _pollard_brent(num, c, max_iter):
+    """Looks for a factor of the odd composite *num* with `Brent's variant
+    <http://maths-people.anu.edu.au/~brent/pub/pub051.html>`_ of Pollard's
+    rho algorithm, using the polynomial x**2 + c.
+    
+    :returns: A non-trivial factor of *num*, or *None* if none was found in
+              about *max_iter* iterations.
+    """
+    y = 2
+    r = 1
+    q = 1
+    g = 1
+    m = 128
+    while g == 1:
+        x = y
+        for i in range(r):
+            y = (y*y + c) % num
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for i in range(min(m, r - k)):
+                y = (y*y + c) % num
+                q = q*(x - y) % num
+            g = _gcd(q, num)
+            k += m
+        r *= 2
+        if g == 1 and r > max_iter:
+            return None
+    if g == num:
+        # The batched gcd overshot: step back one iteration at a time.
+        while True:
+            ys = (ys*ys + c) % num
+            g = _gcd(x - ys, num)
+            if g > 1:
+                break
+    return g if g != num else None
+
+
+def _mont_add(X1, Z1, X2, Z2, X0, Z0, num):
+    """Differential addition P1 + P2 of points of a Montgomery curve in 
+    X:Z coordinates, given P0 = P1 - P2."""
+    u = (X1 - Z1)*(X2 + Z2)
+    v = (X1 + Z1)*(X2 - Z2)
+    add = u + v
+    sub = u - v
+    return (Z0*add*add % num, X0*sub*sub % num)
+
+
+def _mont_double(X, Z, a24, num):
+    """Doubling of a point of a Montgomery curve in X:Z coordinates, where
+    a24 = (A + 2)/4."""
+    s = (X + Z)*(X + Z) % num
+    d = (X - Z)*(X - Z) % num
+    t = s - d
+    return (s*d % num, t*(d + a24*t) % num)
+
+
+def _mont_mul(k, X, Z, a24, num):
+    """Multiplies a point of a Montgomery curve by *k* >= 1 with the
+    Montgomery ladder."""
+    (X0, Z0) = (X, Z)
+    (X1, Z1) = _mont_double(X, Z, a24, num)
+    for bit in bin(k)[3:]:
+        if bit == '1':
+            (X0, Z0) = _mont_add(X1, Z1, X0, Z0, X, Z, num)
+            (X1, Z1) = _mont_double(X1, Z1, a24, num)
+        else:
+            (X1, Z1) = _mont_add(X0, Z0, X1, Z1, X, Z, num)
+            (X0, Z0) = _mont_double(X0, Z0, a24, num)
+    return (X0, Z0)
+
+
+def _ecm(num, B1, curves, rng):
+    """Looks for a factor of the odd composite *num* with Lenstra's `elliptic 
+    curve method <http://en.wikipedia.org/wiki/Lenstra_elliptic_curve_
+    factorization>`_ on Montgomery curves with Suyama's parametrization. 
+    Stage 1 multiplies by all prime powers <= *B1*, stage 2 covers one more
+    prime up to 50*B1 with baby-step giant-step.
+    
+    :returns: A non-trivial factor of *num*, or *None* if none was found
+              with *curves* curves.
+    """
+    B2 = 50*B1
+    D = 210
+    stage1 = 1
+    for p in primes(B1):
+        pk = p
+        while pk*p <= B1:
+            pk *= p
+        stage1 *= pk
+    baby = [j for j in range(1, D//2, 2) if _gcd(j, D) == 1]
+    for curve in range(curves):
+        sigma = rng.randrange(6, num - 1)
+        u = (sigma*sigma - 5) % num
+        v = 4*sigma % num
+        X = pow(u, 3, num)
+        Z = pow(v, 3, num)
+        denom = 16*X*v % num
+        g = _gcd(denom, num)
+        if g != 1:
+            if g != num:
+                return g
+            continue
+        a24 = pow(v - u, 3, num)*(3*u + v)*_mod_inverse(denom, num) % num
+        (X, Z) = _mont_mul(stage1, X, Z, a24, num)
+        g = _gcd(Z, num)
+        if 1 < g < num:
+            return g
+        if g == num:
+            continue
+        # Stage 2: baby steps j*Q for odd j < D/2 coprime to D, giant steps
+        # m*D*Q. A prime q = m*D +/- j divides the order of Q modulo a
+        # factor p if X_m*Z_j - X_j*Z_m = 0 mod p.
+        steps = {1: (X, Z)}
+        (X2, Z2) = _mont_double(X, Z, a24, num)
+        prev = (X, Z)
+        cur = _mont_add(X2, Z2, X, Z, X, Z, num)
+        steps[3] = cur
+        for j in range(5, D//2, 2):
+            (prev, cur) = (cur, _mont_add(cur[0], cur[1], X2, Z2, 
+                                          prev[0], prev[1], num))
+            steps[j] = cur
+        (XD, ZD) = _mont_mul(D, X, Z, a24, num)
+        m = max(B1//D, 2)
+        (Xp, Zp) = _mont_mul((m - 1)*D, X, Z, a24, num)
+        (Xm, Zm) = _mont_mul(m*D, X, Z, a24, num)
+        acc = 1
+        while (m - 1)*D <= B2:
+            for j in baby:
+                (Xj, Zj) = steps[j]
+                acc = acc*(Xm*Zj - Xj*Zm) % num
+            ((Xm, Zm), (Xp, Zp)) = (_mont_add(Xm, Zm, XD, ZD, Xp, Zp, num),
+                                    (Xm, Zm))
+            m += 1
+        g = _gcd(acc, num)
+        if 1 < g < num:
+            return g
+    return None
+
+
+def _mod_inverse(a, num):
+    """Returns the inverse of *a* modulo *num* (gcd(a, num) must be 1)."""
+    (r0, r1) = (a % num, num)
+    (s0, s1) = (1, 0)
+    while r1:
+        q = r0 // r1
+        (r0, r1) = (r1, r0 - q*r1)
+        (s0, s1) = (s1, s0 - q*s1)
+    return s0 % num
+
+
+#: (B1, number of curves) of the successive ECM rounds of
+#: :func:`eulerlib.numtheory.factorint`, tuned for factors of about 20, 25,
+#: 30, 35 and 40 decimal digits.
+_ECM_SCHEDULE = ((2000, 25), (11000, 90), (50000, 300), (250000, 700),
+                 (1000000, 1800))
+
+
+def _find_factor(num, rng):
+    """Returns a non-trivial factor of the odd composite *num*, which has no
+    prime factor below 1000."""
+    root = _isqrt(num)
+    if root*root == num:
+        return root
+    # Pollard rho finds factors up to about 2**32 within the limit.
+    for c in (1, 3, 5):
+        g = _pollard_brent(num, c, 1 << 16)
+        if g is not None:
+            return g
+    for (B1, curves) in _ECM_SCHEDULE:
+        g = _ecm(num, B1, curves, rng)
+        if g is not None:
+            return g
+    c = 7
+    while True:
+        g = _pollard_brent(num, c, 1 << 62)
+        if g is not None:
+            return g
+        c += 2
+
+
+def factorint(num):
+    """Returns the `prime factors`_ *pf* :sub:`i` of *num* and the maximum
+    power *a* :sub:`i` for each prime factor *pf* :sub:`i`, without a table 
+    of primes.
+    
+    :param num: An integer for which prime factors are needed
+    :returns: A list of tuples [(pf1,a1),...(pfi,ai)] sorted by prime factor
+              (empty for *num* < 2)
+    
+    Removes the prime factors below 1000 (found with a single gcd), then
+    splits the cofactor with :func:`eulerlib.prime_numbers.is_prime`,
+    Pollard's rho algorithm (Brent's variant) and Lenstra's elliptic curve
+    method for factors that rho does not find quickly.
+    
+    For example::
+    
+        >>> factorint(2**64 + 1)
+        [(274177, 1), (67280421310721, 1)]
+    """
+    factors = {}
+    if num < 2:
+        return []
+    g = _gcd(num, _TRIAL_PRODUCT)
+    if g > 1:
+        for p in [2] + _TRIAL_PRIMES:
+            if g % p == 0:
+                ai = 0
+                while num % p == 0:
+                    num //= p
+                    ai += 1
+                factors[p] = ai
+    rng = random.Random(num)
+    stack = [num] if num > 1 else []
+    while stack:
+        n = stack.pop()
+        if is_prime(n):
+            factors[n] = factors.get(n, 0) + 1
+        else:
+            d = _find_factor(n, rng)
+            stack.append(d)
+            stack.append(n // d)
+    return sorted(factors.items())
+
+
+class BinomialMod:
+    """Binomial coefficients and permutation counts modulo an integer, with
+    precomputed tables.
+    
+    :param maxnum: Largest *n* covered by the factorial tables. 
+                   (default = 10**6)
+    :param modulus: Modulus of the results. (default = 10**9 + 7)
+    
+    For a prime *modulus* p, tables of n! and 1/n! mod p for n <= 
+    min(maxnum, p - 1) answer :meth:`nCr` and :meth:`nPr` with three lookups
+    and two multiplications. Larger *n* are reduced with `Lucas' theorem
+    <http://en.wikipedia.org/wiki/Lucas%27_theorem>`_ when n >= p, or 
+    computed in O(r) steps otherwise.
+    
+    For a prime power p**e, the table holds the products of the integers 
+    coprime to p below p**e, and :meth:`nCr` uses Granville's extension of
+    Lucas' theorem. Other moduli are split into prime powers (each needs a 
+    table of p**e entries) and the results are combined with the Chinese 
+    remainder theorem. For example::
+    
+        >>> bm = BinomialMod(1000)
+        >>> bm.nCr(1000, 500)
+        159835829
+        >>> BinomialMod(1000, 10**6).nCr(10**5, 500)
+        84800
+    """
+    
+    def __init__(self,maxnum=10**6,modulus=10**9 + 7):
+        """Constructor for *BinomialMod* class
+        """
+        if modulus < 2:
+            raise EulerlibInputError('numtheory','BinomialMod',
+                                     'modulus must be greater than 1')
+        self.limit = maxnum
+        self.modulus = modulus
+        self.factors = factorint(modulus)
+        self.fact_table = None
+        self.inv_fact_table = None
+        self._unit_tables = []
+        if len(self.factors) == 1 and self.factors[0][1] == 1:
+            self._build_factorials(min(maxnum, modulus - 1))
+        else:
+            for (p, e) in self.factors:
+                pe = p**e
+                if pe > 10**7:
+                    raise EulerlibInputError('numtheory','BinomialMod',
+                        'prime power factors of the modulus must be '
+                        '<= 10**7')
+                self._unit_tables.append((p, e, pe, self._units(p, pe)))
+    
+    def _build_factorials(self,top):
+        """Builds the tables of n! and 1/n! modulo the prime modulus for 
+        0 <= n <= top."""
+        mod = self.modulus
+        fact = array("Q", [1])*(top + 1)
+        f = 1
+        for i in range(2, top + 1):
+            f = f*i % mod
+            fact[i] = f
+        inv_fact = array("Q", [1])*(top + 1)
+        f = pow(fact[top], mod - 2, mod)
+        for i in range(top, 1, -1):
+            inv_fact[i] = f
+            f = f*i % mod
+        self.fact_table = fact
+        self.inv_fact_table = inv_fact
+    
+    @staticmethod
+    def _units(p,pe):
+        """Returns the table u[i] = product of the integers j <= i coprime 
+        to p, modulo pe, for 0 <= i < pe."""
+        units = array("Q", [1])*pe
+        u = 1
+        for i in range(2, pe):
+            if i % p:
+                u = u*i % pe
+            units[i] = u
+        return units
+    
+    def _small_nCr(self,n,r):
+        """nCr modulo the prime modulus for 0 <= r <= n < modulus."""
+        mod = self.modulus
+        if n - r < r:
+            r = n - r
+        fact = self.fact_table
+        if n < len(fact):
+            return fact[n]*self.inv_fact_table[r] % mod*\
+                   self.inv_fact_table[n-r] % mod
+        num = 1
+        for i in range(n - r + 1, n + 1):
+            num = num*i % mod
+        if r < len(fact):
+            den = fact[r]
+        else:
+            den = 1
+            for i in range(2, r + 1):
+                den = den*i % mod
+        return num*pow(den, mod - 2, mod) % mod
+    
+    def _prime_power_nCr(self,n,r,p,e,pe,units):
+        """nCr modulo pe = p**e (Granville): the p-free parts of the 
+        factorials are products of the unit table, and the power of p is 
+        the number of carries when adding r and n - r in base p."""
+        v = _legendre(n, p) - _legendre(r, p) - _legendre(n - r, p)
+        if v >= e:
+            return 0
+        full = units[pe-1]
+        
+        def pfree_fact(m):
+            result = 1
+            while m:
+                result = result*pow(full, m//pe, pe)*units[m % pe] % pe
+                m //= p
+            return result
+        
+        den = pfree_fact(r)*pfree_fact(n - r) % pe
+        return p**v*pfree_fact(n)*_mod_inverse(den, pe) % pe
+    
+    def nCr(self,n,r):
+        """Returns :func:`eulerlib.numtheory.nCr` (*n*, *r*) modulo 
+        *modulus*.
+        
+        :param n: Size of the collection
+        :param r: Number of members to be selected from the collection
+        """
+        if n < 0 or r < 0 or r > n:
+            return 0
+        if self.fact_table is not None:
+            mod = self.modulus
+            if n < len(self.fact_table):
+                inv_fact = self.inv_fact_table
+                return self.fact_table[n]*inv_fact[r] % mod*\
+                       inv_fact[n-r] % mod
+            result = 1
+            while n and result:
+                (n, ni) = divmod(n, mod)
+                (r, ri) = divmod(r, mod)
+                if ri > ni:
+                    return 0
+                result = result*self._small_nCr(ni, ri) % mod
+            return result
+        result = 0
+        modulus = 1
+        for (p, e, pe, units) in self._unit_tables:
+            rem = self._prime_power_nCr(n, r, p, e, pe, units)
+            # Chinese remainder theorem, one prime power at a time.
+            t = (rem - result)*_mod_inverse(modulus, pe) % pe
+            result += modulus*t
+            modulus *= pe
+        return result
+    
+    def nPr(self,n,r):
+        """Returns :func:`eulerlib.numtheory.nPr` (*n*, *r*) modulo 
+        *modulus*.
+        
+        :param n: Size of the collection
+        :param r: Number of members to be permutated.
+        """
+        if n < 0 or r < 0 or r > n:
+            return 0
+        mod = self.modulus
+        fact = self.fact_table
+        if fact is not None and n < len(fact):
+            return fact[n]*self.inv_fact_table[n-r] % mod
+        result = 1
+        for i in range(n - r + 1, n + 1):
+            result = result*i % mod
+            if not result:
+                break
+        return result
+
+
+def _spf_factorize(num, spf):
+    """Returns the prime factorization [(pf1,a1),...] of 1 < num < len(spf)
+    using the smallest prime factor table *spf*."""
+    result = []
+    while num > 1:
+        prime = spf[num]
+        ai = 0
+        while spf[num] == prime:
+            num //= prime
+            ai += 1
+        result.append((prime,ai))
+    return result
+
+
+def _factor_values(values, spf):
+    """Factors each integer of *values* with the table *spf* or with
+    :func:`eulerlib.numtheory.factorint` above it."""
+    size = len(spf)
+    return [_spf_factorize(num, spf) if 1 < num < size else factorint(num)
+            for num in values]
+
+
+def _init_factor_worker(spf):
+    """Initializer of the :func:`eulerlib.numtheory.factor_many` worker 
+    processes."""
+    global _worker_spf
+    _worker_spf = spf
+
+
+def _factor_task(values):
+    """Factors a chunk of integers in a worker process."""
+    return _factor_values(values, _worker_spf)
+
+
+def factor_many(values,workers=1,chunksize=4096,limit=10**6):
+    """A generator function that yields the prime factorizations of many
+    integers, in the order of *values*.
+    
+    :param values: An iterable of integers (it may be a generator)
+    :param workers: Number of processes used to factor. *None* uses all 
+                    CPUs. (default = 1)
+    :param chunksize: Number of integers sent to a worker in each task.
+                      (default = 4096)
+    :param limit: Upper limit of the smallest prime factor table. 
+                  (default = 10**6)
+    :returns: Lists of tuples [(pf1,a1),...(pfi,ai)] sorted by prime factor,
+              as returned by :func:`eulerlib.numtheory.factorint`.
+    
+    Integers up to *limit* are factored with a table from 
+    :func:`eulerlib.numtheory.spf_table` (4 bytes per number), which is 
+    built once and sent to each worker process once, when the pool starts.
+    Larger integers are factored with :func:`eulerlib.numtheory.factorint`.
+    *values* is consumed in chunks and at most two chunks per worker are in
+    flight, so memory use stays bounded for long inputs. For example::
+    
+        >>> list(factor_many([12, 97, 2**64 + 1]))
+        [[(2, 2), (3, 1)], [(97, 1)], [(274177, 1), (67280421310721, 1)]]
+    """
+    if chunksize < 1:
+        raise EulerlibInputError('numtheory','factor_many',
+                                 'chunksize must be positive')
+    spf = spf_table(limit)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    values = iter(values)
+    if workers <= 1:
+        while True:
+            chunk = list(islice(values, chunksize))
+            if not chunk:
+                return
+            for result in _factor_values(chunk, spf):
+                yield result
+    pool = multiprocessing.Pool(workers, _init_factor_worker, (spf,))
+    try:
+        pending = deque()
+        exhausted = False
+        while not exhausted or pending:
+            while not exhausted and len(pending) < 2*workers:
+                chunk = list(islice(values, chunksize))
+                if chunk:
+                    pending.append(pool.apply_async(_factor_task, (chunk,)))
+                else:
+                    exhausted = True
+            if pending:
+                for result in pending.popleft().get():
+                    yield result
+    finally:
+        pool.terminate()
+
+
+def _sizeof(obj):
+    """Estimates the memory used by a cached key or value (an integer or a
+    tuple/list of integers or of tuples of integers)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += _sizeof(item)
+    return size
+
+
+class _LRUCache(MutableMapping):
+    """Memo table of :class:`eulerlib.numtheory.Divisors` with an optional 
+    least recently used eviction policy and hit/miss/eviction counters.
+    It supports the usual dictionary methods (keys, values, pop, del, ...);
+    only :meth:`get` counts hits and misses and marks entries as recently
+    used.
+    
+    :param max_entries: Maximum number of entries, 0 to disable the cache or
+                        *None* for no limit. (default = None)
+    :param max_bytes: Maximum estimated size of the keys and values in 
+                      bytes, or *None* for no limit. (default = None)
+    """
+    
+    def __init__(self,max_entries=None,max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def __contains__(self,key):
+        return key in self._data
+    
+    def __getitem__(self,key):
+        return self._data[key]
+    
+    def __iter__(self):
+        return iter(self._data)
+    
+    def __delitem__(self,key):
+        value = self._data.pop(key)
+        if self.max_bytes is not None:
+            self.nbytes -= _sizeof(key) + _sizeof(value)
+    
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, dict(self._data))
+    
+    def items(self):
+        return self._data.items()
+    
+    def get(self,key,default=None):
+        """Returns the value for *key* (marking it as recently used) or 
+        *default*, and counts a hit or a miss."""
+        data = self._data
+        if key in data:
+            self.hits += 1
+            if self.max_entries is not None or self.max_bytes is not None:
+                data.move_to_end(key)
+            return data[key]
+        self.misses += 1
+        return default
+    
+    def __setitem__(self,key,value):
+        if self.max_entries == 0:
+            return
+        data = self._data
+        # Sizes are only tracked when they bound the table.
+        track = self.max_bytes is not None
+        if track and key in data:
+            self.nbytes -= _sizeof(key) + _sizeof(data.pop(key))
+        data[key] = value
+        if self.max_entries is not None:
+            # An overwritten entry is the most recently used one.
+            data.move_to_end(key)
+        if track:
+            self.nbytes += _sizeof(key) + _sizeof(value)
+        while ((self.max_entries is not None and 
+                len(data) > self.max_entries) or 
+               (track and self.nbytes > self.max_bytes and data)):
+            (old_key, old_value) = data.popitem(last=False)
+            if track:
+                self.nbytes -= _sizeof(old_key) + _sizeof(old_value)
+            self.evictions += 1
+    
+    def update(self,items=()):
+        """Inserts the (key, value) pairs of *items* (or the items of a 
+        mapping) in order."""
+        if isinstance(items, Mapping):
+            items = items.items()
+        if self.max_entries is None and self.max_bytes is None:
+            self._data.update(items)
+        else:
+            for (key, value) in items:
+                self[key] = value
+    
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+    
+    def stats(self):
+        if self.max_bytes is None:
+            nbytes = sum([_sizeof(key) + _sizeof(value) 
+                          for (key, value) in self._data.items()])
+        else:
+            nbytes = self.nbytes
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self._data),
+                "bytes": nbytes, "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes}
+
+
+#: Divisors snapshot file format: magic, version, flags, limit, max_limit,
+#: prime table limit, number of primes, sizes in bytes of the prime bitmap, 
+#: of the smallest prime factor table and of the memo tables, and the CRC32 
+#: of everything after the header.
+_SNAPSHOT_MAGIC = b"EULDIVS\x00"
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<8sIIQQQQQQQI4x")
+_SNAPSHOT_SPF = 1
+_SNAPSHOT_AUTO_EXTEND = 2
+_SNAPSHOT_BIG_ENDIAN = 4
+#: Stands for an integer >= 2**64 - 1 in the memo table columns. Such
+#: integers are stored at the end of the stream, in order, as their size in
+#: words followed by their little-endian words.
+_SNAPSHOT_ESCAPE = (1 << 64) - 1
+
+
+def _pad8(nbytes):
+    """Returns the number of zero bytes that align *nbytes* to 8 bytes."""
+    return -nbytes % 8
+
+
+def _write_column(words, column, big):
+    """Appends a column of non-negative integers to the array('Q') *words*,
+    moving the integers that do not fit to the list *big*."""
+    start = len(words)
+    try:
+        words.extend(column)
+    except OverflowError:
+        del words[start:]
+        for value in column:
+            if value < _SNAPSHOT_ESCAPE:
+                words.append(value)
+            else:
+                words.append(_SNAPSHOT_ESCAPE)
+                big.append(value)
+
+
+def _read_column(words, start, size, big):
+    """Returns (list of integers, next index) for the column of *size* 
+    words at *start*. Escaped integers are taken from the iterator *big*.
+    """
+    column = words[start:start + size].tolist()
+    if _SNAPSHOT_ESCAPE in column:
+        column = [next(big) if value == _SNAPSHOT_ESCAPE else value
+                  for value in column]
+    return (column, start + size)
+
+
 class Divisors:
     """Implements methods related to prime factors and divisors.
     
     :param maxnum: Upper limit for the list of primes. (default = 1000)
+    :param prime_table: An optional :class:`eulerlib.prime_numbers.PrimeTable`
+                        with *limit* >= *maxnum* to be used instead of 
+                        sieving. A table loaded from a file is used without 
+                        copying. (default = None)
+    :param spf: If *True*, build a table of smallest prime factors up to
+                *maxnum* (see :func:`eulerlib.numtheory.spf_table`, 4 bytes
+                per number) so that any number up to *maxnum* is factored in 
+                O(log n) steps. (default = False)
+    :param cache_policy: Optional dictionary that maps the name of a memo
+                         table ("sigma_table", "primefact_table",
+                         "pfactonly_table" or "divisors_table") to a
+                         dictionary with the keys "max_entries" and/or 
+                         "max_bytes". See :meth:`set_cache_policy`. 
+                         (default = None, unbounded memo tables)
+    :param auto_extend: If *True*, a query for a number greater than the 
+                        current limit extends the prime (and smallest prime 
+                        factor) tables instead, at least doubling the limit
+                        but not beyond *max_limit*. See :meth:`extend`.
+                        (default = False)
+    :param max_limit: Largest limit reached by *auto_extend*. 
+                      (default = 10**8)
+    
+    Numbers greater than the limit are factored with 
+    :func:`eulerlib.numtheory.factorint`. The tables of an instance can be 
+    saved to a snapshot file with :meth:`save` and restored at the next 
+    start with :meth:`load`.
     """
     
-    def __init__(self,maxnum=1000):
+    _cache_names = ("sigma_table", "primefact_table", "pfactonly_table",
+                    "divisors_table")
+    
+    def __init__(self,maxnum=1000,prime_table=None,spf=False,
+                 cache_policy=None,auto_extend=False,max_limit=10**8):
         """Constructor for *Divisors* class
         """
+        maxnum = _as_int(maxnum, 'numtheory', 'Divisors')
         self.limit = maxnum
-        self.primes_table = primes(maxnum)
-        self.sigma_table = {}
-        self.primefact_table = {}
-        self.pfactonly_table = {}
-        self.divisors_table = {}
+        self.auto_extend = auto_extend
+        self.max_limit = max_limit
+        self._mmap = None
+        self._base_primes = None
+        if prime_table is None:
+            self.primes_table = primes(maxnum)
+        elif prime_table.limit < maxnum:
+            raise EulerlibInputError('numtheory','Divisors',
+                                     'prime_table limit is less than maxnum')
+        else:
+            self.primes_table = prime_table
+        self.spf_table = spf_table(maxnum) if spf else None
+        self.sigma_table = _LRUCache()
+        self.primefact_table = _LRUCache()
+        self.pfactonly_table = _LRUCache()
+        self.divisors_table = _LRUCache()
+        if cache_policy is not None:
+            for (name, policy) in cache_policy.items():
+                self.set_cache_policy(name, **policy)
+
+    def extend(self,maxnum):
+        """Raises the limit of the prime table (and of the smallest prime
+        factor table) to *maxnum*.
+        
+        :param maxnum: New upper limit. Nothing is done if it is not greater
+                       than the current limit.
+        
+        Only the new segment (limit, maxnum] is sieved and the memo tables
+        remain valid. A :class:`eulerlib.prime_numbers.PrimeTable` given to
+        the constructor is copied into a list if *maxnum* exceeds its limit.
+        """
+        if maxnum <= self.limit:
+            return
+        lo = self.limit + 1
+        table = self.primes_table
+        if isinstance(table, list):
+            new_primes = primes_in_range(lo, maxnum)
+            table.extend(new_primes)
+        else:
+            new_primes = list(table.prime_gen(lo, maxnum))
+            if table.limit < maxnum:
+                more = primes_in_range(table.limit + 1, maxnum)
+                new_primes.extend(more)
+                self.primes_table = list(table) + more
+        self._base_primes = None
+        if self.spf_table is not None:
+            if not isinstance(self.spf_table, array):
+                self.spf_table = array("I", self.spf_table)
+            self.spf_table.extend(self._spf_segment(lo, maxnum, new_primes))
+        self.limit = maxnum
+
+    def _spf_segment(self,lo,hi,new_primes):
+        """Returns the smallest prime factors of lo..hi as an array, given
+        the primes in that range. Sieves like 
+        :func:`eulerlib.numtheory.spf_table`, starting each base prime at its 
+        first multiple in the segment.
+        """
+        seg = array("I", [0])*(hi - lo + 1)
+        root = _isqrt(hi)
+        base = self.primes_table
+        if not isinstance(base, list):
+            base = base.primes(root)
+        for p in reversed(base[:bisect_left(base, root + 1)]):
+            start = max(p*p, (lo + p - 1)//p*p)
+            if start <= hi:
+                seg[start-lo::p] = array("I", [p])*((hi - start)//p + 1)
+        for p in new_primes:
+            seg[p-lo] = p
+        return seg
+
+    def _trial_primes(self):
+        """Returns the primes used for trial division: the prime list, or 
+        the primes <= sqrt(*limit*) of a 
+        :class:`eulerlib.prime_numbers.PrimeTable`, expanded once.
+        """
+        table = self.primes_table
+        if isinstance(table, list):
+            return table
+        if self._base_primes is None:
+            self._base_primes = table.primes(_isqrt(self.limit))
+        return self._base_primes
+
+    def _grow(self,num):
+        """Extends the tables to cover *num* if *auto_extend* is set and 
+        *num* <= *max_limit*."""
+        if self.auto_extend and self.limit < num <= self.max_limit:
+            self.extend(min(max(num, 2*self.limit), self.max_limit))
+
+    def set_cache_policy(self,name,max_entries=None,max_bytes=None):
+        """Sets the size limits of the memo table *name* and drops its 
+        current entries.
+        
+        :param name: "sigma_table", "primefact_table", "pfactonly_table" or
+                     "divisors_table"
+        :param max_entries: Maximum number of entries, 0 to disable the memo
+                            table or *None* for no limit. (default = None)
+        :param max_bytes: Maximum estimated memory used by the entries, or 
+                          *None* for no limit. (default = None)
+        
+        When a limit is exceeded, the least recently used entries are
+        evicted.
+        """
+        if name not in self._cache_names:
+            raise EulerlibInputError('numtheory','Divisors.set_cache_policy',
+                                     'unknown memo table {0}'.format(name))
+        setattr(self, name, _LRUCache(max_entries, max_bytes))
+
+    def cache_stats(self):
+        """Returns a dictionary that maps the name of each memo table to a 
+        dictionary with its "hits", "misses", "evictions", "entries", 
+        estimated "bytes", "max_entries" and "max_bytes".
+        """
+        return dict([(name, getattr(self, name).stats()) 
+                     for name in self._cache_names])
+
+    def save(self,path):
+        """Saves a snapshot of the prime table, the smallest prime factor 
+        table and the memo tables (with their cache policies) to the binary
+        file *path*. See :meth:`load`.
+        
+        The prime table is stored as an odd-only bitmap like a 
+        :class:`eulerlib.prime_numbers.PrimeTable`. The memo tables are 
+        stored in their least recently used order; hit/miss counters are not
+        saved.
+        """
+        table = self.primes_table
+        if isinstance(table, list):
+            table_limit = self.limit
+            count = len(table)
+            flags = bytearray((table_limit + 1)//2)
+            for p in table:
+                if p > 2:
+                    flags[p >> 1] = 1
+            chunk = 1 << 20
+            bits = bytearray()
+            for start in range(0, len(flags), chunk):
+                bits += _pack_flags(flags[start:start + chunk])
+        else:
+            (table_limit, count) = (table.limit, table.count)
+            bits = table._bits
+        if self.spf_table is not None:
+            spf = self.spf_table.tobytes() if isinstance(self.spf_table, 
+                                                         array) \
+                  else bytes(self.spf_table)
+        else:
+            spf = b""
+        # Each memo table is written as columns: the keys, then (sigma0,
+        # sigma1) or the list sizes and their concatenated items.
+        words = array("Q")
+        big = []
+        for name in self._cache_names:
+            cache = getattr(self, name)
+            for limit in (cache.max_entries, cache.max_bytes):
+                words.append(0 if limit is None else limit + 1)
+            keys = list(cache)
+            values = [cache[key] for key in keys]
+            if name == "sigma_table":
+                columns = [[v[0] for v in values], [v[1] for v in values]]
+            else:
+                flat = []
+                for value in values:
+                    flat.extend(value)
+                if name == "primefact_table":
+                    flat = [x for pair in flat for x in pair]
+                columns = [[len(v) for v in values], flat]
+            words.append(len(keys))
+            words.append(len(columns[-1]))
+            for column in [keys] + columns:
+                _write_column(words, column, big)
+        words.append(len(big))
+        for value in big:
+            data = value.to_bytes((value.bit_length() + 63)//64*8, "little")
+            chunk = array("Q")
+            chunk.frombytes(data)
+            if sys.byteorder == "big":
+                chunk.byteswap()
+            words.append(len(chunk))
+            words.extend(chunk)
+        memo = words.tobytes()
+        flags = 0
+        if self.spf_table is not None:
+            flags |= _SNAPSHOT_SPF
+        if self.auto_extend:
+            flags |= _SNAPSHOT_AUTO_EXTEND
+        if sys.byteorder == "big":
+            flags |= _SNAPSHOT_BIG_ENDIAN
+        crc = 0
+        sections = (bits, b"\x00"*_pad8(len(bits)), spf, 
+                    b"\x00"*_pad8(len(spf)), memo)
+        for section in sections:
+            crc = zlib.crc32(section, crc)
+        with open(path, "wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION,
+                                          flags, self.limit, self.max_limit,
+                                          table_limit, count, len(bits),
+                                          len(spf), len(memo), 
+                                          crc & 0xffffffff))
+            for section in sections:
+                f.write(section)
+
+    @classmethod
+    def load(cls,path,use_mmap=True):
+        """Loads a snapshot saved by :meth:`save`.
+        
+        :param path: Path of the snapshot file
+        :param use_mmap: If *True*, the file is mapped read-only into memory
+                         and the prime and smallest prime factor tables are
+                         used without copying them (call :meth:`close` to 
+                         release the map). Otherwise they are copied. 
+                         (default = True)
+        :returns: A :class:`eulerlib.numtheory.Divisors` instance
+        
+        Snapshots with another format version, another byte order, a wrong
+        size or a CRC32 mismatch are rejected with 
+        :class:`eulerlib._exceptions.EulerlibInputError`.
+        """
+        header = _SNAPSHOT_HEADER
+        with open(path, "rb") as f:
+            # An empty file cannot be mapped.
+            if os.fstat(f.fileno()).st_size < header.size:
+                raise EulerlibInputError('numtheory','Divisors.load',
+                                         'file is not a Divisors snapshot')
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if mm[:len(_SNAPSHOT_MAGIC)] != _SNAPSHOT_MAGIC:
+                raise EulerlibInputError('numtheory','Divisors.load',
+                                         'file is not a Divisors snapshot')
+            (magic, version, flags, limit, max_limit, table_limit, count, 
+             nbits, nspf, nmemo, crc) = header.unpack_from(mm, 0)
+            if version != _SNAPSHOT_VERSION:
+                raise EulerlibInputError('numtheory','Divisors.load',
+                                         'unsupported snapshot version '
+                                         '{0}'.format(version))
+            if bool(flags & _SNAPSHOT_BIG_ENDIAN) != (sys.byteorder == "big"):
+                raise EulerlibInputError('numtheory','Divisors.load',
+                                         'snapshot has another byte order')
+            spf_start = header.size + nbits + _pad8(nbits)
+            memo_start = spf_start + nspf + _pad8(nspf)
+            if nbits != _bitmap_size(table_limit) or \
+               len(mm) != memo_start + nmemo:
+                raise EulerlibInputError('numtheory','Divisors.load',
+                                         'snapshot is truncated')
+            view = memoryview(mm)
+            body = view[header.size:]
+            valid = zlib.crc32(body) & 0xffffffff == crc
+            body.release()
+            if not valid:
+                view.release()
+                raise EulerlibInputError('numtheory','Divisors.load',
+                                         'snapshot is corrupted (CRC32 '
+                                         'mismatch)')
+            words = array("Q")
+            words.frombytes(view[memo_start:memo_start + nmemo])
+            bits = view[header.size:header.size + nbits]
+            spf = view[spf_start:spf_start + nspf].cast("I") \
+                  if flags & _SNAPSHOT_SPF else None
+            view.release()
+        except Exception:
+            mm.close()
+            raise
+        self = cls.__new__(cls)
+        self.limit = limit
+        self.auto_extend = bool(flags & _SNAPSHOT_AUTO_EXTEND)
+        self.max_limit = max_limit
+        self._mmap = None
+        self._base_primes = None
+        table = PrimeTable._from_buffer(bits, table_limit, count)
+        if use_mmap:
+            self._mmap = mm
+            self.primes_table = table
+            self.spf_table = spf
+        else:
+            self.primes_table = table.primes(limit)
+            self.spf_table = array("I", spf) if spf is not None else None
+            table.close()
+            if spf is not None:
+                spf.release()
+            mm.close()
+        # Skip the columns once to find the escaped integers at the end.
+        i = 0
+        for name in cls._cache_names:
+            (n, nflat) = words[i+2:i+4]
+            i += 4 + 2*n + (n if name == "sigma_table" else nflat)
+        nbig = words[i]
+        i += 1
+        bigs = []
+        for _ in range(nbig):
+            size = words[i]
+            chunk = words[i+1:i+1+size]
+            if sys.byteorder == "big":
+                chunk.byteswap()
+            bigs.append(int.from_bytes(chunk.tobytes(), "little"))
+            i += 1 + size
+        big = iter(bigs)
+        i = 0
+        for name in cls._cache_names:
+            (max_entries, max_bytes, n, nflat) = words[i:i+4]
+            i += 4
+            cache = _LRUCache(max_entries - 1 if max_entries else None,
+                              max_bytes - 1 if max_bytes else None)
+            (keys, i) = _read_column(words, i, n, big)
+            if name == "sigma_table":
+                (s0, i) = _read_column(words, i, n, big)
+                (s1, i) = _read_column(words, i, n, big)
+                values = [(a, b, b - key) for (a, b, key) in zip(s0, s1, keys)]
+            else:
+                (sizes, i) = _read_column(words, i, n, big)
+                (flat, i) = _read_column(words, i, nflat, big)
+                if name == "primefact_table":
+                    pairs = iter(flat)
+                    flat = list(zip(pairs, pairs))
+                values = []
+                start = 0
+                for size in sizes:
+                    values.append(flat[start:start + size])
+                    start += size
+            cache.update(zip(keys, values))
+            setattr(self, name, cache)
+        return self
+
+    def close(self):
+        """Releases the memory map of an instance returned by :meth:`load`.
+        The prime and smallest prime factor tables are copied first, so the
+        instance remains usable.
+        """
+        if self._mmap is None:
+            return
+        table = self.primes_table
+        if isinstance(table, PrimeTable):
+            self.primes_table = table.primes(self.limit)
+            table.close()
+        if isinstance(self.spf_table, memoryview):
+            spf = self.spf_table
+            self.spf_table = array("I", spf)
+            spf.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def _is_prime(self,num):
+        """Returns *True* if *num* is in the prime table. Uses the smallest
+        prime factor table or a binary search instead of a linear scan.
+        """
+        if num > self.limit:
+            self._grow(num)
+        if self.spf_table is not None:
+            return 1 < num <= self.limit and self.spf_table[num] == num
+        table = self.primes_table
+        if isinstance(table, list):
+            i = bisect_left(table, num)
+            return i < len(table) and table[i] == num
+        return num in table
+
+    def _spf_factors(self,num):
+        """Returns the prime factorization [(pf1,a1),...] of 1 < num <= limit
+        using the smallest prime factor table.
+        """
+        return _spf_factorize(num, self.spf_table)
 
     def sigma_function(self,num):
         """Calculates the `divisor functions 
@@ -246,13 +1899,14 @@ class Divisors:
               (includes 1, excludes *num*)
         
         """
-        if num in self.sigma_table:
-            return self.sigma_table[num]
-        elif ((num < 1) or (num > self.limit)):
+        cached = self.sigma_table.get(num)
+        if cached is not None:
+            return cached
+        elif num < 1:
             return ()
         elif num == 1:
             return (1,1,0)
-        elif (num in self.primes_table):
+        elif self._is_prime(num):
             return (2,num+1,1)
         else:
             sigma0 = 1
@@ -279,18 +1933,32 @@ class Divisors:
         .. note::
         
             num = (pf1**a1)*(pf2**a2)..*(pfi**ai)
+        
+        Numbers greater than the limit are factored with 
+        :func:`eulerlib.numtheory.factorint`.
         """
-        if num in self.primefact_table:
-            return self.primefact_table[num]
-        elif ((num < 2) or (num > self.limit)):
+        cached = self.primefact_table.get(num)
+        if cached is not None:
+            return cached
+        elif num < 2:
             return []
-        elif num in self.primes_table:
+        if num > self.limit:
+            self._grow(num)
+        if num > self.limit:
+            result = factorint(num)
+            self.primefact_table[num] = result
+            return result
+        elif self._is_prime(num):
             self.primefact_table[num] = [(num,1)]
             return [(num,1)]
+        elif self.spf_table is not None:
+            result = self._spf_factors(num)
+            self.primefact_table[num] = result
+            return result
         else:
             result = []
             tnum = num
-            for prime in self.primes_table:
+            for prime in self._trial_primes():
                 if(tnum%prime==0):
                     ai = 2
                     pdiv = prime*prime
@@ -301,7 +1969,7 @@ class Divisors:
                     pdiv //= prime
                     result.append((prime,ai))
                     tnum //= pdiv
-                    if(tnum in self.primes_table):
+                    if(self._is_prime(tnum)):
                         result.append((tnum,1))
                         break
                     elif(tnum==1):
@@ -316,17 +1984,28 @@ class Divisors:
         :param num: An integer for which prime factors are needed
         :returns: A list [pf1,pf2,...pfi] of prime factors of *num*
         """
-        if num in self.pfactonly_table:
-            return self.pfactonly_table[num]
-        elif ((num < 2) or (num > self.limit)):
+        cached = self.pfactonly_table.get(num)
+        if cached is not None:
+            return cached
+        elif num < 2:
             return []
-        elif num in self.primes_table:
+        if num > self.limit:
+            self._grow(num)
+        if num > self.limit:
+            result = [pf for (pf,ai) in self.prime_factors(num)]
+            self.pfactonly_table[num] = result
+            return result
+        elif self._is_prime(num):
             self.pfactonly_table[num] = [num]
             return [num]
+        elif self.spf_table is not None:
+            result = [pf for (pf,ai) in self._spf_factors(num)]
+            self.pfactonly_table[num] = result
+            return result
         else:
             result = []
             tnum = num
-            for prime in self.primes_table:
+            for prime in self._trial_primes():
                 if(tnum%prime==0):
                     result.append(prime)
                     pdiv = prime*prime
@@ -334,7 +2013,7 @@ class Divisors:
                         pdiv *= prime
                     pdiv //= prime
                     tnum //= pdiv
-                    if(tnum in self.primes_table):
+                    if(self._is_prime(tnum)):
                         result.append(tnum)
                         break
                     elif(tnum == 1):
@@ -348,15 +2027,18 @@ class Divisors:
         :param num: An integer for which divisors are needed.
         :returns: A list [d1,d2,...dn] of divisors of *num*
         """
+        cached = self.divisors_table.get(num)
+        if cached is not None:
+            return list(cached)
         result = []
-        if (num < 1) or (num > self.limit):
+        if num < 1:
             return result
         result.append(1)
         if (num == 1):
             return result
-        elif (num in self.primes_table):
+        elif self._is_prime(num):
             result.append(num)
-            self.divisors_table[num] = result
+            self.divisors_table[num] = list(result)
             return result
         else:
             pfs = self.prime_factors(num)
@@ -369,9 +2051,121 @@ class Divisors:
                 result += newdivs
                 newdivs = []
             result.sort()
-            self.divisors_table[num] = result
+            self.divisors_table[num] = list(result)
             return result
 
+    def divisor_gen(self,num,lo=1,hi=None,sort=False):
+        """A generator function that yields the divisors d of *num* such 
+        that lo <= d <= hi, without building or storing the list.
+        
+        :param num: An integer for which divisors are needed.
+        :param lo: Smallest divisor to yield. (default = 1)
+        :param hi: Largest divisor to yield. (default = *num*)
+        :param sort: If *True*, yield the divisors in ascending order. 
+                     (default = False)
+        
+        The divisors are products of the prime powers of 
+        :meth:`prime_factors`, and products greater than *hi* are not 
+        extended. In sorted order, every divisor d is generated once from 
+        d/p, p being its largest prime factor, using a heap. For example, 
+        the divisors up to the square root::
+        
+            >>> list(Divisors().divisor_gen(360, hi=isqrt(360), sort=True))
+            [1, 2, 3, 4, 5, 6, 8, 9, 10, 12, 15, 18]
+        """
+        if num < 1:
+            return
+        if hi is None or hi > num:
+            hi = num
+        if lo > hi:
+            return
+        pfs = self.prime_factors(num)
+        nfs = len(pfs)
+        if sort:
+            # (divisor, index of its largest prime, exponent of that prime)
+            heap = [(1, -1, 0)]
+            while heap:
+                (d, last, e) = heappop(heap)
+                if d >= lo:
+                    yield d
+                if last >= 0 and e < pfs[last][1] and d*pfs[last][0] <= hi:
+                    heappush(heap, (d*pfs[last][0], last, e + 1))
+                for j in range(last + 1, nfs):
+                    dp = d*pfs[j][0]
+                    if dp > hi:
+                        break
+                    heappush(heap, (dp, j, 1))
+            return
+        stack = [(1, 0)]
+        while stack:
+            (d, i) = stack.pop()
+            if i == nfs:
+                if d >= lo:
+                    yield d
+                continue
+            (p, a) = pfs[i]
+            for e in range(a + 1):
+                stack.append((d, i + 1))
+                d *= p
+                if d > hi:
+                    break
+
+    def unitary_divisor_gen(self,num):
+        """A generator function that yields the `unitary divisors 
+        <http://en.wikipedia.org/wiki/Unitary_divisor>`_ d of *num* 
+        (gcd(d, num/d) = 1), in no particular order.
+        
+        :param num: An integer for which unitary divisors are needed.
+        """
+        if num < 1:
+            return
+        result = [1]
+        yield 1
+        for (p, a) in self.prime_factors(num):
+            pa = p**a
+            new = [d*pa for d in result]
+            for d in new:
+                yield d
+            result += new
+
+    def num_divisors(self,num,unitary=False):
+        """Returns the number of divisors of *num* from its prime 
+        factorization, without enumerating them.
+        
+        :param num: A positive integer
+        :param unitary: If *True*, count the unitary divisors only.
+                        (default = False)
+        """
+        if num < 1:
+            return 0
+        count = 1
+        for (p, a) in self.prime_factors(num):
+            count *= 2 if unitary else a + 1
+        return count
+
+    def divisor_sum(self,num,k=1,unitary=False):
+        """Returns the sum of the *k*-th powers of the divisors of *num* 
+        (the `divisor function`_ sigma_k) from its prime factorization, 
+        without enumerating them.
+        
+        :param num: A positive integer
+        :param k: Power of the divisors. (default = 1)
+        :param unitary: If *True*, sum over the unitary divisors only.
+                        (default = False)
+        """
+        if num < 1:
+            return 0
+        total = 1
+        for (p, a) in self.prime_factors(num):
+            pk = p**k
+            if unitary:
+                total *= 1 + pk**a
+            elif k == 0:
+                total *= a + 1
+            else:
+                total *= (pk**(a + 1) - 1)//(pk - 1)
+        return total
+
     def phi(self,num):
         """Returns the number of `totatives 
         <http://en.wikipedia.org/wiki/Totative>`_ of *num*
@@ -391,10 +2185,10 @@ class Divisors:
             return 0
         if(num == 1):
             return 1
-        if(num in self.primes_table):
+        if(self._is_prime(num)):
             return num-1
         pfs = self.prime_factors_only(num)
         prod = num
         for pfi in pfs:
-            prod = prod*(pfi-1)/pfi
+            prod = prod//pfi*(pfi-1)
         return prod
\ No newline at end of file
@@ -21,152 +21,1490 @@
 
 """
 
-__all__ = ["prime_gen", "prime_wheel_fact_gen", "primes", "primes_wheel_fact",
-           "is_prime"]
+__all__ = ["prime_gen", "prime_wheel_fact_gen", "PrimeStream", "primes",
+           "primes_wheel_fact", "prime_range_gen", "primes_in_range",
+           "is_prime", "is_prime_many",
+           "prime_pi", "prime_sum", "prime_power_sum", "PrimeTable",
+           "clear_prime_cache", "set_prime_cache_bound", "prime_cache_info"]
 
-from itertools import islice as it_islice
 from itertools import count as it_count
 from itertools import compress as it_compress
 from itertools import cycle as it_cycle
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+import multiprocessing
+import threading
+from collections import deque
+from math import gcd as _gcd
+from ._exceptions import EulerlibInputError
 
-def prime_gen():
+#: Number of odd integers sieved per segment by the bytearray sieve engine.
+#: One byte per odd number, so a segment occupies 128 KiB and stays resident
+#: in the L2 cache of most processors.
+_SEGMENT_SIZE = 1 << 17
+
+#: Number of segments sieved by a worker process per task of the parallel
+#: sieve.
+_SEGMENTS_PER_TASK = 16
+
+try:
+    from math import isqrt as _isqrt
+except ImportError:
+    def _isqrt(num):
+        """Integer square root (floor) of a non-negative integer using
+        Newton's method.
+        """
+        if num < 2:
+            return num
+        x = 1 << ((num.bit_length() + 1) // 2)
+        while True:
+            y = (x + num // x) // 2
+            if y >= x:
+                return x
+            x = y
+
+
+def _as_int(num, module, method):
+    """Returns *num* as an int. Integral values of other types (e.g. the
+    float 1e6) are converted; other values raise 
+    :class:`eulerlib._exceptions.EulerlibInputError`.
+    """
+    if type(num) is int:
+        return num
+    try:
+        value = int(num)
+    except (TypeError, ValueError, OverflowError):
+        value = None
+    if value is None or value != num:
+        raise EulerlibInputError(module, method, 
+                                 '{0!r} is not an integer'.format(num))
+    return value
+
+def _first_base_prime(root):
+    """Returns the smallest odd prime number greater than *root*."""
+    p = max(root + 1, 3) | 1
+    while not is_prime(p):
+        p += 2
+    return p
+
+
+def prime_gen(start=2):
     """A generator function that yields prime numbers using the `Sieve of
     Eratosthenes <http://en.wikipedia.org/wiki/Sieve_of_Eratosthenes>`_
     algorithm.
+    
+    :param start: Yield the prime numbers >= *start*. (default = 2)
+    
+    Numbers below *start* are not sieved: the dictionary of composites is
+    seeded with the next multiple of every prime up to the square root of 
+    *start*.
        
     .. note::
     
         This function is based on the erat2a function which can be found
         `here <http://stackoverflow.com/a/3796442>`_. Variable names were
-        changed and comments added for clarity.
+        changed and comments added for clarity. A prime is only added to the
+        dictionary when the candidate reaches its square, so the dictionary
+        holds the primes up to the square root of the current candidate
+        (`postponed sieve <http://stackoverflow.com/a/10733621>`_).
     """
-    yield 2
+    if start <= 2:
+        yield 2
+    first = max(start, 3) | 1
+    root = _isqrt(first - 1)
     comp_dict = {}
-    for num in it_islice(it_count(3),0,None,2):
+    for p in _small_primes(root):
+        # Seed the dictionary with the first odd multiple of p >= first.
+        test = first + (-first % p)
+        if test & 1 == 0:
+            test += p
+        while test in comp_dict:
+            test += 2*p
+        comp_dict[test] = p
+    # The next base prime and the generator of the ones after it. The
+    # generator is only created when it is needed.
+    base = _first_base_prime(root)
+    base_sq = base*base
+    base_gen = None
+    for num in it_count(first, 2):
         p = comp_dict.pop(num,None)
-        if p is not None:
-            # num is a composite. Get the next composite that is not already
-            # in the dictionary and that has p as prime factor. Add it to
-            # the dictionary. The composite number is thus "sieved" out.
-            # By taking a 2*p step, we avoid checking if test is even.
-            test = num + 2*p
-            while test in comp_dict:
-                test = test + 2*p
-            comp_dict[test] = p
-        else:            
-            # num is a prime.
-            # Add the first composite number that has 'num' as the
-            # only prime factor to the composite numbers dictionary
-            comp_dict[num*num] = num
-            # return num
-            yield num
-
-
-def prime_wheel_fact_gen():
+        if p is None:
+            if num != base_sq:
+                # num is a prime.
+                yield num
+                continue
+            # num is the square of the next base prime. Add the base prime
+            # to the dictionary.
+            p = base
+            if base_gen is None:
+                base_gen = prime_gen(base + 1)
+            base = next(base_gen)
+            base_sq = base*base
+        # num is a composite. Get the next composite that is not already
+        # in the dictionary and that has p as prime factor. Add it to
+        # the dictionary. The composite number is thus "sieved" out.
+        # By taking a 2*p step, we avoid checking if test is even.
+        test = num + 2*p
+        while test in comp_dict:
+            test = test + 2*p
+        comp_dict[test] = p
+
+
+#: Supported wheel sizes of :func:`eulerlib.prime_numbers.prime_wheel_fact_gen`
+#: and the primes that generate them.
+_WHEEL_PRIMES = {30: (2, 3, 5), 210: (2, 3, 5, 7), 2310: (2, 3, 5, 7, 11),
+                 30030: (2, 3, 5, 7, 11, 13)}
+_wheel_cache = {}
+
+
+def _wheel_tables(wheel):
+    """Returns (mask, steps) for a wheel of size *wheel*.
+    
+    mask[i] is 1 if the odd number 2*i + 1 is coprime to *wheel*. steps[r] 
+    is the distance from a residue r coprime to *wheel* to the next residue
+    coprime to *wheel* (0 for the other residues).
+    """
+    if wheel not in _wheel_cache:
+        coprime = [1 if _gcd(x, wheel) == 1 else 0 for x in range(wheel)]
+        mask = coprime[1::2]
+        steps = [0]*wheel
+        residues = [r for r in range(wheel) if coprime[r]]
+        for (r, r_next) in zip(residues, residues[1:] + [wheel + 1]):
+            steps[r] = r_next - r
+        _wheel_cache[wheel] = (mask, steps)
+    return _wheel_cache[wheel]
+
+
+def prime_wheel_fact_gen(start=2,wheel=30):
     """A generator function that yields prime numbers using the `wheel
     factorized <http://en.wikipedia.org/wiki/Wheel_factorization>`_ `Sieve of 
     Eratosthenes`_.
     
+    :param start: Yield the prime numbers >= *start*. (default = 2)
+    :param wheel: Size of the wheel: 30 (2*3*5), 210 (2*3*5*7), 2310 
+                  (2*3*5*7*11) or 30030 (2*3*5*7*11*13). (default = 30)
+    
+    Only the numbers coprime to *wheel* are candidates: 26.7% of all numbers
+    for the 30-wheel, 22.9% for 210, 20.8% for 2310 and 19.2% for 30030. 
+    The multiples of a prime p that are added to the dictionary of 
+    composites are also restricted to p*m with m coprime to *wheel*, using
+    a precomputed table of gaps between such m.
+    
     .. note::
     
         This function is based on the erat3 function which can be found
         `here <http://stackoverflow.com/a/3796442>`_. Variable names were
-        changed and comments added for clarity.
+        changed and comments added for clarity. Primes are added to the
+        dictionary when the candidate reaches their square, as in 
+        :func:`eulerlib.prime_numbers.prime_gen`.
     """
-    yield 2
-    yield 3
-    yield 5
+    if wheel not in _WHEEL_PRIMES:
+        raise EulerlibInputError('prime_numbers','prime_wheel_fact_gen',
+                                 'wheel should be 30, 210, 2310 or 30030')
+    wheel_primes = _WHEEL_PRIMES[wheel]
+    for p in wheel_primes:
+        if p >= start:
+            yield p
+    (mask, steps) = _wheel_tables(wheel)
+    first = max(start, wheel_primes[-1] + 2) | 1
     # The mask is used with itertools.compress method to generate prime
-    # candidates after eliminating numbers using the wheel. The mask
-    # contains a 1 when the corresponding number has 2,3 or 5 as a factor
-    # only odd numbers are considered so the mask has only 15 values instead
-    # of 30.
-    wheel_mask = [0 if x%3 == 0 or x%5 == 0 else 1 for x in range(7,37,2)]
-    modulos = frozenset([x%30 for x in range(31,61,2) 
-                              if x%3 != 0 and x%5 != 0])
+    # candidates after eliminating numbers using the wheel. It contains a 1
+    # when the corresponding odd number has no factor in wheel_primes. It is
+    # rotated to start at the first candidate.
+    offset = (first % wheel) // 2
+    wheel_mask = mask[offset:] + mask[:offset]
+    root = _isqrt(first - 1)
     comp_dict = {}
-    for num in it_compress(it_islice(it_count(7),0,None,2), 
-                        it_cycle(wheel_mask)):
+    for p in _small_primes(root):
+        if p <= wheel_primes[-1]:
+            continue
+        # Seed the dictionary with the first multiple p*m >= first such 
+        # that m is coprime to the wheel.
+        m = -(-first // p)
+        while _gcd(m, wheel) != 1:
+            m += 1
+        while p*m in comp_dict:
+            m += steps[m % wheel]
+        comp_dict[p*m] = p
+    base = _first_base_prime(max(root, wheel_primes[-1]))
+    base_sq = base*base
+    base_gen = None
+    for num in it_compress(it_count(first, 2), it_cycle(wheel_mask)):
         p = comp_dict.pop(num,None)
-        if p is not None:
-            # num is a composite. Get the next composite that is not already
-            # in the dictionary, that meets the wheel criteria and that has p 
-            # as prime factor. Add it to the dictionary. The composite number 
-            # is thus "sieved" out.
-            # By taking a 2*p step, we avoid checking if test is even.
-            test = num + 2*p
-            while test in comp_dict or test%30 not in modulos:
-                test = test + 2*p
-            comp_dict[test] = p
-            # delete 'num' from comp_dict to free memory.
-        else:            
-            # num is a prime.
-            # Add the first composite number that has 'num' as the
-            # only prime factor to the composite numbers dictionary
-            comp_dict[num*num] = num
-            # return num
-            yield num
-      
-
-def primes(num):
-    """Returns a list of prime numbers. Uses the 
-    :func:`eulerlib.prime_numbers.prime_gen` generator function.
-    
-    :param num: The upper limit for prime numbers list (pn < num)
-    :returns: List of prime numbers [p1,p2,...pn] such that pn < num.
-    
-    Uses the prime_gen function that uses Sieve of Eratosthanes.
-    """
-    mypgen = prime_gen()
-    result = []
-    while True:
-        p = next(mypgen)
-        if p > num:
+        if p is None:
+            if num != base_sq:
+                # num is a prime.
+                yield num
+                continue
+            p = base
+            if base_gen is None:
+                base_gen = prime_wheel_fact_gen(base + 1, wheel)
+            base = next(base_gen)
+            base_sq = base*base
+        # num = p*m is a composite. Get the next composite p*m' that is not
+        # already in the dictionary and such that m' is coprime to the wheel.
+        # Add it to the dictionary. The composite number is thus "sieved" 
+        # out.
+        m = num // p
+        m += steps[m % wheel]
+        while p*m in comp_dict:
+            m += steps[m % wheel]
+        comp_dict[p*m] = p
+
+
+class PrimeStream:
+    """An iterator over the prime numbers >= *start* whose position can be 
+    saved with :meth:`checkpoint` and resumed with :meth:`restore`.
+    
+    :param start: Yield the prime numbers >= *start*. (default = 2)
+    :param wheel: Size of the wheel of 
+                  :func:`eulerlib.prime_numbers.prime_wheel_fact_gen` to be
+                  used instead of :func:`eulerlib.prime_numbers.prime_gen`
+                  (e.g. 30 or 210), or *False* for no wheel. *True* selects
+                  the 30-wheel. (default = False)
+    
+    The state of the underlying sieve is fully determined by the next 
+    candidate: its dictionary holds the next multiple of each prime up to the
+    square root of the candidate, which is rebuilt on restore in 
+    O(sqrt(candidate)) time. A checkpoint is therefore a small dictionary
+    that can be stored as JSON. Long running jobs can be sharded by starting
+    each stream at a different value.
+    
+    For example::
+    
+        >>> stream = PrimeStream(10**12)
+        >>> next(stream)
+        1000000000039
+        >>> state = stream.checkpoint()
+        >>> next(PrimeStream.restore(state))
+        1000000000061
+    """
+    
+    _version = 1
+    
+    def __init__(self,start=2,wheel=False):
+        """Constructor for *PrimeStream* class
+        """
+        if wheel is True:
+            wheel = 30
+        self.wheel = wheel
+        self._next = start
+        if self.wheel:
+            self._gen = prime_wheel_fact_gen(start, wheel)
+        else:
+            self._gen = prime_gen(start)
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        p = next(self._gen)
+        self._next = p + 1
+        return p
+    
+    def checkpoint(self):
+        """Returns the state of the stream as a dictionary of integers and 
+        booleans that can be serialized (e.g. with :mod:`json`).
+        """
+        return {"version": self._version, "next": self._next,
+                "wheel": self.wheel}
+    
+    @classmethod
+    def restore(cls,state):
+        """Returns a new stream that continues from a *state* returned by
+        :meth:`checkpoint`.
+        """
+        if state.get("version") != cls._version:
+            raise EulerlibInputError('prime_numbers','PrimeStream.restore',
+                                     'unsupported checkpoint version')
+        return cls(state["next"], state["wheel"])
+    
+    def close(self):
+        """Closes the underlying generator."""
+        self._gen.close()
+
+
+def _odd_sieve(limit):
+    """Returns a bytearray *flags* such that flags[i] is 1 if and only if 
+    2*i + 1 is a prime number, for all odd numbers 2*i + 1 <= *limit*.
+    """
+    size = (limit + 1) // 2
+    flags = bytearray([1]) * size
+    if size > 0:
+        flags[0] = 0
+    for i in range(1, (_isqrt(limit) - 1) // 2 + 1):
+        if flags[i]:
+            p = 2*i + 1
+            # Start at p*p: smaller multiples have a smaller prime factor.
+            start = p*p // 2
+            flags[start::p] = bytearray((size - start - 1) // p + 1)
+    return flags
+
+
+def _small_primes(limit):
+    """Returns a list of the odd prime numbers <= *limit* using a single
+    (unsegmented) odd-only bytearray sieve. Used to obtain the base primes
+    of the segmented sieve.
+    """
+    flags = _odd_sieve(limit)
+    return list(it_compress(range(1, 2*len(flags), 2), flags))
+
+
+def _sieve_segment(lo, size, base_primes):
+    """Sieves the odd numbers lo, lo+2, ..., lo+2*(size-1) where *lo* is odd.
+    
+    :param lo: First (odd) number of the segment
+    :param size: Number of odd numbers in the segment
+    :param base_primes: Ascending list of odd primes including all odd
+                        primes <= square root of the last number in the
+                        segment.
+    :returns: A bytearray *flags* where flags[i] is 1 if and only if 
+              lo + 2*i is prime.
+    """
+    flags = bytearray([1]) * size
+    hi = lo + 2*size
+    for p in base_primes:
+        pp = p*p
+        if pp >= hi:
             break
+        if pp >= lo:
+            start = (pp - lo) // 2
         else:
-            result.append(p)
-    mypgen.close()
+            # Smallest offset r such that lo + r is an odd multiple of p.
+            r = -lo % p
+            if r & 1:
+                r += p
+            start = r // 2
+        if start < size:
+            flags[start::p] = bytearray((size - start - 1) // p + 1)
+    if lo == 1:
+        flags[0] = 0
+    return flags
+
+
+def _segmented_sieve(lo, hi, segment_size=_SEGMENT_SIZE):
+    """A generator function that sieves the odd numbers in [*lo*, *hi*) one
+    segment at a time.
+    
+    :param lo: Lower bound (inclusive) of the range to be sieved
+    :param hi: Upper bound (exclusive) of the range to be sieved
+    :param segment_size: Number of odd numbers in each segment
+    :returns: Yields tuples (start, flags) where flags[i] is 1 if and only if
+              start + 2*i is prime. *start* is always odd.
+    
+    Memory use is bounded by one segment plus the base primes up to the
+    square root of *hi*.
+    """
+    start = max(lo, 1) | 1
+    if start >= hi:
+        return
+    base_primes = _small_primes(_isqrt(hi - 1))
+    while start < hi:
+        size = min(segment_size, (hi - start + 1) // 2)
+        yield (start, _sieve_segment(start, size, base_primes))
+        start += 2*size
+
+
+def _sieve_prime_chunks(lo, hi, workers=1):
+    """A generator function that yields the odd prime numbers p such that 
+    lo <= p < hi as a sequence of ascending chunks (iterables of primes).
+    
+    :param lo: Lower bound (inclusive) of the range to be sieved
+    :param hi: Upper bound (exclusive) of the range to be sieved
+    :param workers: Number of worker processes. See 
+                    :func:`eulerlib.prime_numbers._parallel_sieve`.
+    """
+    start = max(lo, 1) | 1
+    if start >= hi:
+        return
+    if (workers != 1 and hi < 1 << 64 and 
+            hi - start > 2*_SEGMENT_SIZE*_SEGMENTS_PER_TASK):
+        base_primes = _small_primes(_isqrt(hi - 1))
+        for chunk in _parallel_sieve(start, hi, base_primes, _SEGMENT_SIZE,
+                                     workers):
+            yield chunk
+        return
+    for (start, flags) in _segmented_sieve(start, hi):
+        yield it_compress(range(start, start + 2*len(flags), 2), flags)
+
+
+#: Base primes of the parallel sieve, set once per worker process.
+_worker_base_primes = None
+
+
+def _init_sieve_worker(base_primes):
+    """Initializer of the parallel sieve worker processes."""
+    global _worker_base_primes
+    _worker_base_primes = base_primes
+
+
+def _sieve_task(task):
+    """Sieves *size* odd numbers from *start* in a worker process, one 
+    segment at a time, and returns the primes found as the bytes of an
+    array('Q').
+    """
+    (start, size, segment_size) = task
+    result = array("Q")
+    for offset in range(0, size, segment_size):
+        count = min(segment_size, size - offset)
+        lo = start + 2*offset
+        flags = _sieve_segment(lo, count, _worker_base_primes)
+        result.extend(it_compress(range(lo, lo + 2*count, 2), flags))
+    return result.tobytes()
+
+
+def _parallel_sieve(start, hi, base_primes, segment_size, workers):
+    """Parallel version of :func:`eulerlib.prime_numbers._sieve_prime_chunks`
+    for *hi* <= 2**64.
+    
+    The range is split into tasks of several segments that are sieved in a
+    pool of *workers* processes (all CPUs if *workers* is None). The base
+    primes are sent to each worker once. Each worker also extracts the 
+    primes of its task and returns them packed in an array('Q'), so the
+    calling process only unpacks the arrays (at C speed) and yields them in
+    ascending order. At most two tasks per worker are in flight, which 
+    bounds memory use when the consumer is slower than the pool.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    task_size = segment_size*_SEGMENTS_PER_TASK
+    tasks = []
+    while start < hi:
+        size = min(task_size, (hi - start + 1) // 2)
+        tasks.append((start, size, segment_size))
+        start += 2*size
+    tasks.reverse()
+    pool = multiprocessing.Pool(workers, _init_sieve_worker, (base_primes,))
+    try:
+        pending = deque()
+        while tasks or pending:
+            while tasks and len(pending) < 2*workers:
+                pending.append(pool.apply_async(_sieve_task, (tasks.pop(),)))
+            chunk = array("Q")
+            chunk.frombytes(pending.popleft().get())
+            yield chunk
+    finally:
+        pool.terminate()
+
+
+def _sieve_window(lo, hi, base_primes):
+    """Returns a list of all prime numbers p such that lo <= p < hi, given
+    the odd *base_primes* up to (at least) the square root of *hi*.
+    """
+    result = [2] if lo <= 2 < hi else []
+    start = max(lo, 1) | 1
+    if start < hi:
+        flags = _sieve_segment(start, (hi - start + 1) // 2, base_primes)
+        result.extend(it_compress(range(start, hi, 2), flags))
     return result
 
 
+def _sieve_primes(lo, hi, workers=1):
+    """Returns a list of all prime numbers p such that lo <= p < hi using the
+    segmented bytearray sieve.
+    """
+    result = []
+    if lo <= 2 < hi:
+        result.append(2)
+    for chunk in _sieve_prime_chunks(lo, hi, workers):
+        result.extend(chunk)
+    return result
+
+
+class _PrimeCache:
+    """Process-wide store of the prime numbers up to *limit* in ascending 
+    order, shared by :func:`eulerlib.prime_numbers.primes`, 
+    :func:`eulerlib.prime_numbers.is_prime` and 
+    :class:`eulerlib.numtheory.Divisors`.
+    
+    When primes beyond *limit* (but not beyond *bound*) are requested, only
+    the new segment is sieved and appended. Requests beyond *bound* are 
+    answered from the cache plus a sieve of the remainder, which is not 
+    stored.
+    """
+    
+    def __init__(self,bound=10**8):
+        self.bound = bound
+        self.clear()
+        self._lock = threading.Lock()
+    
+    def clear(self):
+        self.limit = 1
+        self.table = array("Q")
+    
+    def extend(self,num,workers=1):
+        """Sieves the primes up to min(*num*, *bound*) that are not cached
+        yet.
+        """
+        num = min(num, self.bound)
+        if num <= self.limit:
+            return
+        with self._lock:
+            if num <= self.limit:
+                return
+            table = self.table
+            for chunk in _sieve_prime_chunks(self.limit + 1, num + 1, 
+                                             workers):
+                table.extend(chunk)
+            if self.limit < 2 <= num:
+                table.insert(0, 2)
+            self.limit = num
+    
+    def primes(self,lo,hi,workers=1):
+        """Returns a list of the primes p such that lo <= p <= hi."""
+        if hi <= self.bound:
+            self.extend(hi, workers)
+        table = self.table
+        result = table[bisect_left(table, max(lo, 0)):
+                       bisect_left(table, min(hi, self.limit) + 1)].tolist()
+        if hi > self.limit:
+            result.extend(_sieve_primes(max(lo, self.limit + 1), hi + 1, 
+                                        workers))
+        return result
+    
+    def __contains__(self,num):
+        table = self.table
+        i = bisect_left(table, num)
+        return i < len(table) and table[i] == num
+
+
+_prime_cache = _PrimeCache()
+
+
+def clear_prime_cache():
+    """Releases the process-wide cache of prime numbers used by 
+    :func:`eulerlib.prime_numbers.primes`, 
+    :func:`eulerlib.prime_numbers.is_prime` and 
+    :class:`eulerlib.numtheory.Divisors`.
+    """
+    with _prime_cache._lock:
+        _prime_cache.clear()
+
+
+def set_prime_cache_bound(bound):
+    """Sets the largest number up to which prime numbers are cached 
+    process-wide (default = 10**8, about 46 MB of primes). A smaller bound 
+    drops the cached primes above it. Use 0 to disable the cache.
+    """
+    with _prime_cache._lock:
+        _prime_cache.bound = bound
+        if _prime_cache.limit > bound:
+            table = _prime_cache.table
+            del table[bisect_left(table, bound + 1):]
+            _prime_cache.limit = max(bound, 1)
+
+
+def prime_cache_info():
+    """Returns a dictionary with the *limit* up to which prime numbers are 
+    cached, the number of cached primes (*count*) and the *bound* of the
+    process-wide prime cache.
+    """
+    return {"limit": _prime_cache.limit, "count": len(_prime_cache.table),
+            "bound": _prime_cache.bound}
+
+
+def primes(num,workers=1):
+    """Returns a list of prime numbers.
+    
+    :param num: The upper limit for prime numbers list (pn <= num). Integral
+                floats such as 1e6 are accepted.
+    :param workers: Number of processes used to sieve. *None* uses all CPUs.
+                    (default = 1)
+    :returns: List of prime numbers [p1,p2,...pn] such that pn <= num.
+    
+    Uses a segmented, odd-only `Sieve of Eratosthenes`_ on bytearrays. Memory
+    use is bounded by the segment size plus the base primes up to the square
+    root of *num*. Use :func:`eulerlib.prime_numbers.prime_gen` when the 
+    upper limit is not known in advance.
+    
+    With *workers* > 1, segments are sieved in a process pool and merged in
+    order. Small limits are always sieved in the calling process.
+    
+    The primes are kept in a process-wide cache that grows as larger limits
+    are requested (see :func:`eulerlib.prime_numbers.set_prime_cache_bound`
+    and :func:`eulerlib.prime_numbers.clear_prime_cache`). A new list is 
+    returned on each call.
+    """
+    return _prime_cache.primes(2, _as_int(num, 'prime_numbers', 'primes'), 
+                               workers)
+
+
 def primes_wheel_fact(num):
-    """Returns a list of prime numbers. Uses the 
+    """Returns a list of prime numbers.
+    
+    :param num: The upper limit for prime numbers list (pn <= num). Integral
+                floats such as 1e6 are accepted.
+    :returns: List of prime numbers [p1,p2,...pn] such that pn <= num.
+    
+    Since the upper limit is known, this uses the same segmented bytearray
+    sieve and cache as :func:`eulerlib.prime_numbers.primes`, which is 
+    faster than driving the 
     :func:`eulerlib.prime_numbers.prime_wheel_fact_gen` generator function.
+    """
+    return _prime_cache.primes(2, _as_int(num, 'prime_numbers',
+                                          'primes_wheel_fact'))
+
+
+def prime_range_gen(lo,hi,workers=1):
+    """A generator function that yields the prime numbers p such that 
+    lo <= p <= hi, in ascending order.
     
-    :param num: The upper limit for prime numbers list (pn < num)
-    :returns: List of prime numbers [p1,p2,...pn] such that pn < num.
+    :param lo: Lower limit of the range (inclusive)
+    :param hi: Upper limit of the range (inclusive)
+    :param workers: Number of processes used to sieve. *None* uses all CPUs.
+                    (default = 1)
     
-    Uses the prime_wheel_fact_gen function that uses Sieve of Eratosthanes
-    with wheel factorization based on the first 3 primes: 2, 3 and 5.
+    Only the requested window is sieved, one segment at a time, using the 
+    base primes up to the square root of *hi*. The running time is 
+    proportional to the width of the window (plus the base primes), not to
+    *hi*.
     """
-    mypgen = prime_wheel_fact_gen()
-    result = []
+    if lo <= 2 <= hi:
+        yield 2
+    for chunk in _sieve_prime_chunks(lo, hi + 1, workers):
+        for p in chunk:
+            yield p
+
+
+def primes_in_range(lo,hi,workers=1):
+    """Returns a list of prime numbers in a range.
+    
+    :param lo: Lower limit of the range (inclusive)
+    :param hi: Upper limit of the range (inclusive)
+    :param workers: Number of processes used to sieve. *None* uses all CPUs.
+                    (default = 1)
+    :returns: List of prime numbers [p1,p2,...pn] such that lo <= p1 and
+              pn <= hi.
+    
+    For example::
+    
+        >>> primes_in_range(10**12, 10**12 + 100)
+        [1000000000039, 1000000000061, 1000000000063, 1000000000091]
+    
+    Windows within the process-wide prime cache are read from it, other
+    windows are sieved without extending the cache. See 
+    :func:`eulerlib.prime_numbers.prime_range_gen`.
+    """
+    if hi <= _prime_cache.limit:
+        return _prime_cache.primes(lo, hi)
+    return _sieve_primes(lo, hi + 1, workers)
+
+
+#: Odd primes below 1000 and their product (with 2), used by 
+#: :func:`eulerlib.prime_numbers.is_prime` to reject numbers with a small
+#: factor using a single gcd.
+_TRIAL_PRIMES = _small_primes(1000)
+_TRIAL_PRIMES_SET = frozenset([2] + _TRIAL_PRIMES)
+_TRIAL_PRODUCT = 2
+for _p in _TRIAL_PRIMES:
+    _TRIAL_PRODUCT *= _p
+del _p
+
+#: Miller-Rabin bases that are deterministic below a bound, as tuples
+#: (bound, bases). The last set (found by Jim Sinclair) covers num < 2**64.
+_MR_BASES_64 = ((4759123141, (2, 7, 61)),
+                (1122004669633, (2, 13, 23, 1662803)),
+                (1 << 64, (2, 325, 9375, 28178, 450775, 9780504, 1795265022)))
+
+#: First 13 primes as Miller-Rabin bases: deterministic for 
+#: num < 3.3 * 10**24, a strong probable prime test above that.
+_MR_BASES_BIG = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def _miller_rabin(num, bases):
+    """Returns *True* if odd *num* > 2 is a strong probable prime to all of 
+    the *bases*.
+    """
+    d = num - 1
+    s = 0
+    while d & 1 == 0:
+        d >>= 1
+        s += 1
+    for a in bases:
+        a %= num
+        if a == 0:
+            continue
+        x = pow(a, d, num)
+        if x == 1 or x == num - 1:
+            continue
+        for r in range(s - 1):
+            x = x*x % num
+            if x == num - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _jacobi(a, n):
+    """Returns the Jacobi symbol (a/n) for odd n > 0."""
+    a %= n
+    result = 1
+    while a != 0:
+        while a & 1 == 0:
+            a >>= 1
+            if n & 7 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a & 3 == 3 and n & 3 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def _strong_lucas(num):
+    """Returns *True* if odd *num*, which is not a perfect square, is a strong
+    Lucas probable prime with parameters chosen by Selfridge's method A.
+    """
+    D = 5
     while True:
-        p = next(mypgen)
-        if p > num:
+        j = _jacobi(D, num)
+        if j == -1:
             break
-        else:
-            result.append(p)
-    mypgen.close()
-    return result
+        if j == 0 and abs(D) != num:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    Q = (1 - D) // 4
+    d = num + 1
+    s = 0
+    while d & 1 == 0:
+        d >>= 1
+        s += 1
+    # Binary Lucas chain for U_d, V_d and Q**d with P = 1.
+    U = 1
+    V = 1
+    Qk = Q % num
+    for bit in bin(d)[3:]:
+        U = U*V % num
+        V = (V*V - 2*Qk) % num
+        Qk = Qk*Qk % num
+        if bit == '1':
+            U, V = (U + V) % num, (D*U + V) % num
+            if U & 1:
+                U += num
+            U >>= 1
+            if V & 1:
+                V += num
+            V >>= 1
+            Qk = Qk*Q % num
+    if U == 0 or V == 0:
+        return True
+    for r in range(s - 1):
+        V = (V*V - 2*Qk) % num
+        if V == 0:
+            return True
+        Qk = Qk*Qk % num
+    return False
 
 
-def is_prime(num):
+def is_prime(num,method="auto"):
     """Primality checking function: returns *True* if *num* is a prime number.
+    
+    :param num: Integer to be checked. Integral floats such as 1e4 are 
+                accepted; other non-integers raise 
+                :class:`eulerlib._exceptions.EulerlibInputError`.
+    :param method: Primality test to use after trial division by the primes
+                   below 1000 (default = "auto"):
+                   
+                   * "auto": "miller-rabin" for num < 2**64, "bpsw" above.
+                   * "miller-rabin": `Miller-Rabin 
+                     <http://en.wikipedia.org/wiki/Miller%E2%80%93Rabin_
+                     primality_test>`_ test. Deterministic for num < 2**64 
+                     (7 bases) and for num < 3.3 * 10**24 (13 bases). 
+                   * "bpsw": `Baillie-PSW 
+                     <http://en.wikipedia.org/wiki/Baillie%E2%80%93PSW_
+                     primality_test>`_ test. No counterexample is known.
+                   * "trial": Trial division by all primes up to the square
+                     root of *num*. Exact but slow for large *num*.
+    :returns: *True* if *num* is a prime number.
+    
+    Numbers up to the limit of the process-wide prime cache (filled by 
+    :func:`eulerlib.prime_numbers.primes`) are looked up in the cache.
     """
-    result = True
-    if num < 4:
-        if (num != 2 and num != 3):
-            result = False
+    if method not in ("auto", "miller-rabin", "bpsw", "trial"):
+        raise EulerlibInputError('prime_numbers','is_prime',
+                                 'unknown method {0}'.format(method))
+    if type(num) is not int:
+        num = _as_int(num, 'prime_numbers', 'is_prime')
+    if num < 1000:
+        return num in _TRIAL_PRIMES_SET
+    if _gcd(num, _TRIAL_PRODUCT) != 1:
+        return False
+    if num <= _prime_cache.limit:
+        return num in _prime_cache
+    if num < 1009*1009:
+        # No prime factor below 1009, so num is prime.
+        return True
+    if method == "auto":
+        method = "miller-rabin" if num < 1 << 64 else "bpsw"
+    if method == "miller-rabin":
+        for (bound, bases) in _MR_BASES_64:
+            if num < bound:
+                return _miller_rabin(num, bases)
+        return _miller_rabin(num, _MR_BASES_BIG)
+    elif method == "bpsw":
+        if not _miller_rabin(num, (2,)):
+            return False
+        if _isqrt(num)**2 == num:
+            return False
+        return _strong_lucas(num)
     else:
-        nsqrt = int(num**0.5) + 1
-        mygen = prime_gen()
-        for p in mygen:
-            if p > nsqrt:
-                break
+        for p in prime_range_gen(1009, _isqrt(num)):
             if num%p == 0:
-                result = False
-                break
-        mygen.close()
+                return False
+        return True
+
+
+#: Largest value looked up in the shared sieve by
+#: :func:`eulerlib.prime_numbers.is_prime_many`. Larger values are tested
+#: with Miller-Rabin.
+_MANY_SIEVE_LIMIT = 1 << 22
+
+
+def is_prime_many(values):
+    """Batch primality checking: returns a boolean mask that is *True* where
+    the corresponding value in *values* is a prime number.
+    
+    :param values: An iterable of integers or a NumPy integer array
+    :returns: A list of booleans, or a NumPy boolean array of the same shape
+              if *values* is a NumPy array.
+    
+    Values up to 2**22 are looked up in a single sieve shared by the whole 
+    batch. The remaining values are tested with
+    :func:`eulerlib.prime_numbers.is_prime`, except for NumPy arrays where
+    values below 2**32 are tested with a vectorized deterministic 
+    Miller-Rabin test (bases 2, 7 and 61).
+    
+    For example::
+    
+        >>> is_prime_many([1, 2, 9, 97, 2**61 - 1])
+        [False, True, False, True, True]
+    """
+    if hasattr(values, "dtype"):
+        return _is_prime_many_numpy(values)
+    values = list(values)
+    if not values:
+        return []
+    # Do not sieve much further than the size of the batch justifies.
+    limit = min(max(values), _MANY_SIEVE_LIMIT, 
+                max(64*len(values), 1000))
+    flags = _odd_sieve(max(limit, 2))
+    result = []
+    for num in values:
+        if num <= limit:
+            result.append(num == 2 or (num > 2 and num & 1 == 1 and 
+                                       flags[num >> 1] == 1))
+        else:
+            result.append(is_prime(num))
+    return result
+
+
+def _is_prime_many_numpy(values):
+    """NumPy implementation of :func:`eulerlib.prime_numbers.is_prime_many`.
+    """
+    import numpy as np
+    arr = np.asarray(values)
+    if arr.dtype.kind not in "iu":
+        if arr.dtype.kind != "O":
+            raise EulerlibInputError('prime_numbers','is_prime_many',
+                                     'values must be integers')
+        flat = is_prime_many(arr.ravel().tolist())
+        return np.array(flat, dtype=bool).reshape(arr.shape)
+    flat = arr.ravel()
+    mask = np.zeros(flat.shape, dtype=bool)
+    if flat.size == 0:
+        return mask.reshape(arr.shape)
+    limit = int(min(flat.max(), _MANY_SIEVE_LIMIT))
+    # Sieve lookup for small values. The mask below is computed element-wise,
+    # so even values are looked up too: sieve up to an odd limit.
+    flags = np.frombuffer(bytes(_odd_sieve(max(limit, 2) | 1)), 
+                          dtype=np.uint8)
+    small = (flat >= 2) & (flat <= limit)
+    idx = flat[small]
+    mask[small] = (idx == 2) | ((idx & 1 == 1) & 
+                                (flags[(idx >> 1).astype(np.intp)] == 1))
+    # Vectorized Miller-Rabin for values below 2**32: products of two
+    # residues fit in an unsigned 64-bit integer.
+    medium = (flat > limit) & (flat < 1 << 32)
+    if medium.any():
+        nums = flat[medium].astype(np.uint64)
+        mask[medium] = _miller_rabin_vec(np, nums)
+    # Arbitrary precision for the rest.
+    large = flat > max(limit, (1 << 32) - 1)
+    if large.any():
+        mask[large] = [is_prime(int(num)) for num in flat[large]]
+    return mask.reshape(arr.shape)
+
+
+def _miller_rabin_vec(np, nums):
+    """Vectorized primality test for a uint64 array *nums* of values greater
+    than 1000 and less than 2**32: trial division by the odd primes below 
+    1000, then Miller-Rabin with bases 2, 7 and 61, which is deterministic 
+    for *nums* < 4759123141.
+    """
+    one = np.uint64(1)
+    result = (nums & one) == one
+    for p in _TRIAL_PRIMES:
+        result &= (nums % np.uint64(p)) != 0
+    candidates = np.flatnonzero(result)
+    nums = nums[candidates]
+    d = nums - one
+    s = np.zeros(nums.shape, dtype=np.uint64)
+    for i in range(32):
+        even = (d & one) == 0
+        if not even.any():
+            break
+        d = np.where(even, d >> one, d)
+        s += even
+    passed_all = np.ones(nums.shape, dtype=bool)
+    for a in (2, 7, 61):
+        # x = a**d % nums by binary exponentiation
+        x = np.ones(nums.shape, dtype=np.uint64)
+        base = np.full(nums.shape, a, dtype=np.uint64) % nums
+        exp = d.copy()
+        for i in range(32):
+            x = np.where((exp & one) == one, x*base % nums, x)
+            base = base*base % nums
+            exp >>= one
+        passed = (x == one) | (x == nums - one)
+        for r in range(1, 32):
+            x = x*x % nums
+            passed |= (x == nums - one) & (np.uint64(r) < s)
+        passed_all &= passed
+    result[candidates] = passed_all
     return result
 
+
+def _power_sum_poly(k):
+    """Returns (coeffs, denom) such that the sum of i**k for i = 1..n equals
+    (sum of coeffs[j]*n**j) // denom, using `Faulhaber's formula 
+    <http://en.wikipedia.org/wiki/Faulhaber%27s_formula>`_.
+    """
+    from fractions import Fraction
+    # Bernoulli numbers B_0..B_k with B_1 = +1/2
+    bern = [Fraction(1)]
+    for m in range(1, k + 1):
+        acc = Fraction(0)
+        binom = 1
+        for j in range(m):
+            acc += binom*bern[j]
+            binom = binom*(m + 1 - j)//(j + 1)
+        bern.append(-acc/(m + 1))
+    if k >= 1:
+        bern[1] = Fraction(1, 2)
+    coeffs = [Fraction(0)]*(k + 2)
+    binom = 1
+    for j in range(k + 1):
+        coeffs[k + 1 - j] = binom*bern[j]/(k + 1)
+        binom = binom*(k + 1 - j)//(j + 1)
+    denom = 1
+    for c in coeffs:
+        denom = denom*c.denominator//_gcd(denom, c.denominator)
+    return ([int(c*denom) for c in coeffs], denom)
+
+
+def _lucy_hedgehog(x, k):
+    """Returns the sum of p**k over all primes p <= x (*x* >= 2) using the
+    Lucy_Hedgehog algorithm in O(x**(3/4)) time and O(x**(1/2)) memory.
+    
+    small[v] and large[i] hold the running sums for the values v and x//i.
+    After processing all primes up to p, they equal the sum of n**k over 
+    the integers 2 <= n <= v (or x//i) that are prime or have no prime
+    factor <= p.
+    """
+    (coeffs, denom) = _power_sum_poly(k)
+    def psum(n):
+        acc = 0
+        for c in reversed(coeffs):
+            acc = acc*n + c
+        return acc//denom - 1
+    r = _isqrt(x)
+    small = [0] + [psum(v) for v in range(1, r + 1)]
+    large = [0] + [psum(x//i) for i in range(1, r + 1)]
+    sp = 0
+    for p in [2] + _small_primes(r):
+        pk = p**k
+        p2 = p*p
+        lim = min(r, x//p2)
+        rp = min(r//p, lim)
+        for i in range(1, rp + 1):
+            large[i] -= pk*(large[i*p] - sp)
+        xp = x//p
+        for i in range(rp + 1, lim + 1):
+            large[i] -= pk*(small[xp//i] - sp)
+        for v in range(r, p2 - 1, -1):
+            small[v] -= pk*(small[v//p] - sp)
+        sp += pk
+    return large[1]
+
+
+def _lucy_hedgehog_numpy(np, x):
+    """Vectorized :func:`eulerlib.prime_numbers._lucy_hedgehog` for k = 0,
+    using 64-bit NumPy arrays.
+    """
+    r = _isqrt(x)
+    idx = np.arange(r + 1, dtype=np.int64)
+    quot = x//np.maximum(idx, 1)
+    small = idx - 1
+    small[0] = 0
+    large = quot - 1
+    large[0] = 0
+    for (j, p) in enumerate([2] + _small_primes(r)):
+        p2 = p*p
+        lim = min(r, x//p2)
+        rp = min(r//p, lim)
+        large[1:rp + 1] -= large[p:rp*p + 1:p] - j
+        if lim > rp:
+            large[rp + 1:lim + 1] -= small[quot[rp + 1:lim + 1]//p] - j
+        if r >= p2:
+            small[p2:] -= np.repeat(small[p:r//p + 1] - j, p)[:r + 1 - p2]
+    return int(large[1])
+
+
+def _lucy_hedgehog_sum_numpy(np, x):
+    """Vectorized :func:`eulerlib.prime_numbers._lucy_hedgehog` for k = 1.
+    
+    The sums do not fit in 64 bits, so each of them is split into two 
+    NumPy limbs, sum = hi*2**bits + lo with 0 <= lo < 2**bits. The limb 
+    size keeps p*lo within 64 bits for every sieving prime p. Returns 
+    *None* if *x* is too large for the hi limb to fit as well.
+    """
+    r = _isqrt(x)
+    bits = 62 - r.bit_length()
+    if (x*x).bit_length() - bits >= 62:
+        return None
+    mask = (1 << bits) - 1
+    idx = np.arange(r + 1, dtype=np.int64)
+    quot = x//np.maximum(idx, 1)
+    # Sums of 2..v for v <= r fit in 64 bits; those of 2..x//i are split
+    # with Python integers.
+    tri = idx*(idx + 1)//2 - 1
+    tri[0] = 0
+    (small_hi, small_lo) = (tri >> bits, tri & mask)
+    sums = [0] + [(v*(v + 1) >> 1) - 1 for v in quot[1:].tolist()]
+    large_hi = np.array([t >> bits for t in sums], dtype=np.int64)
+    large_lo = np.array([t & mask for t in sums], dtype=np.int64)
+    sp = 0
+    for p in [2] + _small_primes(r):
+        (sp_hi, sp_lo) = (sp >> bits, sp & mask)
+        p2 = p*p
+        lim = min(r, x//p2)
+        rp = min(r//p, lim)
+        ranges = [(slice(1, rp + 1), slice(p, rp*p + 1, p), large_hi, 
+                   large_lo)]
+        if lim > rp:
+            ranges.append((slice(rp + 1, lim + 1), 
+                           quot[rp + 1:lim + 1]//p, small_hi, small_lo))
+        for (dst, src, hi, lo) in ranges:
+            large_hi[dst] -= p*(hi[src] - sp_hi)
+            lo = large_lo[dst] - p*(lo[src] - sp_lo)
+            large_hi[dst] += lo >> bits
+            large_lo[dst] = lo & mask
+        if r >= p2:
+            n = r + 1 - p2
+            small_hi[p2:] -= p*np.repeat(small_hi[p:r//p + 1] - sp_hi, 
+                                         p)[:n]
+            lo = small_lo[p2:] - p*np.repeat(small_lo[p:r//p + 1] - sp_lo,
+                                             p)[:n]
+            small_hi[p2:] += lo >> bits
+            small_lo[p2:] = lo & mask
+        sp += p
+    return (int(large_hi[1]) << bits) + int(large_lo[1])
+
+
+def prime_pi(x):
+    """Returns the number of prime numbers <= *x* (the `prime-counting 
+    function <http://en.wikipedia.org/wiki/Prime-counting_function>`_) 
+    without enumerating the primes.
+    
+    :param x: Upper limit (inclusive)
+    :returns: Number of primes p such that p <= x.
+    
+    Uses the Lucy_Hedgehog algorithm in O(x**(3/4)) time and O(x**(1/2))
+    memory. If NumPy is installed it is used to vectorize the algorithm.
+    
+    For example::
+    
+        >>> prime_pi(10**10)
+        455052511
+    """
+    return prime_power_sum(x, 0)
+
+
+def prime_sum(x):
+    """Returns the sum of all prime numbers <= *x* without enumerating the
+    primes.
+    
+    :param x: Upper limit (inclusive)
+    :returns: Sum of all primes p such that p <= x.
+    
+    See :func:`eulerlib.prime_numbers.prime_power_sum`. The running time
+    grows as x**(3/4): with NumPy installed, x = 10**12 takes about 12 
+    seconds and x = 10**13 about 75 seconds. Without NumPy, x = 10**10
+    already takes about 3 seconds.
+    """
+    return prime_power_sum(x, 1)
+
+
+def prime_power_sum(x,k):
+    """Returns the sum of p**k over all prime numbers p <= *x* without 
+    enumerating the primes.
+    
+    :param x: Upper limit (inclusive)
+    :param k: Non-negative integer exponent
+    :returns: Sum of p**k over all primes p such that p <= x.
+    
+    Uses the Lucy_Hedgehog algorithm in O(x**(3/4)) time and O(x**(1/2))
+    memory. For example, prime_power_sum(x,0) is the number of primes <= x.
+    If NumPy is installed it is used to vectorize the algorithm for k = 0
+    and k = 1.
+    """
+    if k < 0:
+        raise EulerlibInputError('prime_numbers','prime_power_sum',
+                                 'k should be a non-negative integer')
+    if x < 2:
+        return 0
+    if x >= 1 << 20 and k < 2:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is not None and x < 1 << 62:
+            if k == 0:
+                return _lucy_hedgehog_numpy(np, x)
+            result = _lucy_hedgehog_sum_numpy(np, x)
+            if result is not None:
+                return result
+    return _lucy_hedgehog(x, k)
+
+
+#: File format of :class:`eulerlib.prime_numbers.PrimeTable`: a header 
+#: (magic, format version, reserved, limit, number of primes) followed by
+#: the bit-packed odd-only sieve. Bit j of byte i is set if and only if 
+#: 2*(8*i + j) + 1 is prime.
+_TABLE_MAGIC = b"EULPRIME"
+_TABLE_VERSION = 1
+_TABLE_HEADER = struct.Struct("<8sIIQQ")
+
+#: Number of bitmap bytes per block of the rank directory of
+#: :class:`eulerlib.prime_numbers.PrimeTable`.
+_RANK_BLOCK = 256
+
+#: Translation table that maps a byte to its number of set bits.
+_POPCOUNT = bytes(bytearray([bin(b).count("1") for b in range(256)]))
+
+#: _BIT_EXPAND[b] holds the 8 bits of byte b as 8 bytes of 0/1 flags.
+_BIT_EXPAND = [bytes(bytearray([(b >> j) & 1 for j in range(8)])) 
+               for b in range(256)]
+
+
+def _pack_flags(flags):
+    """Packs a bytearray of 0/1 flags into bits, 8 flags per byte, least
+    significant bit first.
+    """
+    pad = -len(flags) % 8
+    if pad:
+        flags = flags + bytearray(pad)
+    # Flag j of every 8-byte word sits at bit 8*j. Shifting by 7*j moves
+    # it to bit j of the lowest byte of the word.
+    x = int.from_bytes(flags, "little")
+    x |= x >> 7
+    x |= x >> 14
+    x |= x >> 28
+    return bytearray(x.to_bytes(len(flags), "little")[::8])
+
+
+def _unpack_bits(bits):
+    """Expands bit-packed flags to a bytearray of 0/1 flags, 8 per byte."""
+    return bytearray(b"".join(map(_BIT_EXPAND.__getitem__, bits)))
+
+
+def _bitmap_size(limit):
+    """Returns the size in bytes of the odd-only bitmap up to *limit*."""
+    return ((limit + 1)//2 + 7)//8
+
+
+class PrimeTable:
+    """A compact table of all prime numbers <= *limit*, stored as an odd-only 
+    bitmap (one bit per odd number, *limit*/16 bytes).
+    
+    :param limit: Upper limit of the table (inclusive). (default = 1000)
+    
+    A table can be saved to a versioned binary file once with 
+    :meth:`save` (or :meth:`build` for limits that do not fit in memory)
+    and loaded with :meth:`load`, which maps the file read-only with 
+    :mod:`mmap`. All processes that load the same file then share the same 
+    memory pages.
+    
+    The table supports ``len()`` (number of primes), ``in`` (an O(1) bit
+    test) and iteration in ascending order, so it can be used in place of a
+    list of primes, e.g. by :class:`eulerlib.numtheory.Divisors`.
+    
+    :meth:`prime_pi`, :meth:`nth_prime`, :meth:`next_prime` and 
+    :meth:`prev_prime` use a rank directory (the number of primes before
+    every block of 256 bitmap bytes) that is built on first use and adds 
+    about 1/64 to the size of the bitmap. They run in constant time, except
+    for a binary search over the directory in :meth:`nth_prime`.
+    
+    For example::
+    
+        >>> PrimeTable(10**6).save("primes.bin")
+        >>> table = PrimeTable.load("primes.bin")
+        >>> table.primes(20)
+        [2, 3, 5, 7, 11, 13, 17, 19]
+        >>> 999983 in table
+        True
+    """
+    
+    def __init__(self,limit=1000):
+        """Constructor for *PrimeTable* class
+        """
+        self.limit = max(limit, 0)
+        self.count = 1 if limit >= 2 else 0
+        self._bits = bytearray()
+        self._mmap = None
+        self._rank = None
+        for (start, flags) in _segmented_sieve(1, self.limit + 1):
+            self.count += flags.count(1)
+            self._bits += _pack_flags(flags)
+    
+    def __len__(self):
+        return self.count
+    
+    def __contains__(self,num):
+        if num & 1 == 0 or num > self.limit:
+            return num == 2 and self.limit >= 2
+        if num < 0:
+            return False
+        i = num >> 1
+        return (self._bits[i >> 3] >> (i & 7)) & 1 == 1
+    
+    def __iter__(self):
+        return self.prime_gen()
+    
+    def prime_gen(self,lo=2,hi=None):
+        """A generator function that yields the prime numbers p in the table 
+        such that lo <= p <= hi.
+        
+        :param lo: Lower limit (inclusive). (default = 2)
+        :param hi: Upper limit (inclusive). (default = *limit*)
+        """
+        if hi is None or hi > self.limit:
+            hi = self.limit
+        if lo <= 2 <= hi:
+            yield 2
+        # Expand the bitmap one chunk of 8*chunk odd numbers at a time. The
+        # chunks start small and double, so that callers which stop after a
+        # few primes (like trial division) do not expand a whole chunk.
+        chunk = 1 << 4
+        byte_lo = max(lo, 3) >> 4
+        last = hi >> 4
+        while byte_lo <= last:
+            byte_hi = min(byte_lo + chunk, last + 1)
+            chunk = min(2*chunk, 1 << 12)
+            flags = _unpack_bits(self._bits[byte_lo:byte_hi])
+            start = 16*byte_lo + 1
+            stop = min(start + 2*len(flags), hi + 1)
+            if start < lo:
+                skip = (lo - start + 1)//2
+                flags[:skip] = bytearray(skip)
+            for p in it_compress(range(start, stop, 2), flags):
+                yield p
+            byte_lo = byte_hi
+    
+    def primes(self,num=None):
+        """Returns a list of the prime numbers p in the table such that 
+        p <= num.
+        
+        :param num: Upper limit (inclusive). (default = *limit*)
+        """
+        return list(self.prime_gen(2, num))
+    
+    def is_prime(self,num):
+        """Returns *True* if *num* is a prime number. Uses a bit test for
+        *num* <= *limit* and :func:`eulerlib.prime_numbers.is_prime` above.
+        """
+        if num > self.limit:
+            return is_prime(num)
+        return num in self
+    
+    def _rank_directory(self):
+        """Returns the rank directory: entry b is the number of odd primes in
+        the bitmap bytes before byte b*_RANK_BLOCK.
+        """
+        if self._rank is None:
+            rank = array("Q", [0])
+            total = 0
+            chunk = _RANK_BLOCK*4096
+            for lo in range(0, len(self._bits), chunk):
+                counts = bytes(self._bits[lo:lo + chunk]).translate(_POPCOUNT)
+                for b in range(0, len(counts), _RANK_BLOCK):
+                    total += sum(bytearray(counts[b:b + _RANK_BLOCK]))
+                    rank.append(total)
+            self._rank = rank
+        return self._rank
+    
+    def _odd_rank(self,i):
+        """Returns the number of set bits with index <= *i* in the bitmap."""
+        byte = i >> 3
+        block = byte // _RANK_BLOCK
+        partial = bytes(self._bits[block*_RANK_BLOCK:byte]).translate(_POPCOUNT)
+        last = self._bits[byte] & ((2 << (i & 7)) - 1)
+        return (self._rank_directory()[block] + sum(bytearray(partial)) + 
+                _POPCOUNT[last])
+    
+    def prime_pi(self,x):
+        """Returns the number of prime numbers <= *x*. Uses the rank 
+        directory for *x* <= *limit* and 
+        :func:`eulerlib.prime_numbers.prime_pi` above.
+        """
+        if x > self.limit:
+            return prime_pi(x)
+        if x < 3:
+            return 1 if x == 2 else 0
+        return 1 + self._odd_rank((x - 1) >> 1)
+    
+    def nth_prime(self,k):
+        """Returns the *k*-th prime number (nth_prime(1) = 2).
+        """
+        if k < 1 or k > self.count:
+            raise EulerlibInputError('prime_numbers','PrimeTable.nth_prime',
+                                     'k should be between 1 and the number '
+                                     'of primes in the table')
+        if k == 1:
+            return 2
+        target = k - 1
+        rank = self._rank_directory()
+        block = bisect_left(rank, target) - 1
+        seen = rank[block]
+        byte = block*_RANK_BLOCK
+        counts = bytearray(bytes(self._bits[byte:byte + _RANK_BLOCK])
+                           .translate(_POPCOUNT))
+        for c in counts:
+            if seen + c >= target:
+                break
+            seen += c
+            byte += 1
+        value = self._bits[byte]
+        for j in range(8):
+            if (value >> j) & 1:
+                seen += 1
+                if seen == target:
+                    return 2*(8*byte + j) + 1
+    
+    def next_prime(self,num):
+        """Returns the smallest prime number greater than *num*. Candidates
+        beyond *limit* are tested with :func:`eulerlib.prime_numbers.is_prime`.
+        """
+        if num < 2:
+            return 2
+        if num < self.limit:
+            k = self.prime_pi(num) + 1
+            if k <= self.count:
+                return self.nth_prime(k)
+            num = self.limit
+        num = num + 1 | 1
+        while not is_prime(num):
+            num += 2
+        return num
+    
+    def prev_prime(self,num):
+        """Returns the largest prime number less than *num*. Candidates 
+        beyond *limit* are tested with :func:`eulerlib.prime_numbers.is_prime`.
+        """
+        if num <= 2:
+            raise EulerlibInputError('prime_numbers','PrimeTable.prev_prime',
+                                     'there is no prime less than 2')
+        if num > self.limit + 1:
+            cand = (num - 2) | 1
+            while cand > max(self.limit, 2):
+                if is_prime(cand):
+                    return cand
+                cand -= 2
+            if self.limit < 2:
+                return 2
+            num = self.limit + 1
+        return self.nth_prime(self.prime_pi(num - 1))
+    
+    def save(self,path):
+        """Saves the table to the binary file *path*.
+        """
+        with open(path, "wb") as f:
+            f.write(_TABLE_HEADER.pack(_TABLE_MAGIC, _TABLE_VERSION, 0,
+                                       self.limit, self.count))
+            f.write(self._bits)
+    
+    @classmethod
+    def build(cls,path,limit):
+        """Sieves the primes <= *limit* directly to the binary file *path*,
+        one segment at a time, and returns the loaded table. Memory use is
+        bounded by the sieve segment size.
+        """
+        count = 1 if limit >= 2 else 0
+        with open(path, "wb") as f:
+            f.write(_TABLE_HEADER.pack(_TABLE_MAGIC, _TABLE_VERSION, 0,
+                                       limit, 0))
+            for (start, flags) in _segmented_sieve(1, limit + 1):
+                count += flags.count(1)
+                f.write(_pack_flags(flags))
+            f.seek(0)
+            f.write(_TABLE_HEADER.pack(_TABLE_MAGIC, _TABLE_VERSION, 0,
+                                       limit, count))
+        return cls.load(path)
+    
+    @classmethod
+    def load(cls,path):
+        """Loads a table saved by :meth:`save` or :meth:`build`. The file is
+        mapped read-only into memory, so the bitmap is not copied.
+        """
+        with open(path, "rb") as f:
+            # An empty file cannot be mapped.
+            if os.fstat(f.fileno()).st_size < _TABLE_HEADER.size:
+                raise EulerlibInputError('prime_numbers','PrimeTable.load',
+                                         'file is not a prime table')
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, reserved, limit, count) = \
+            _TABLE_HEADER.unpack_from(mm, 0)
+        nbytes = _bitmap_size(limit)
+        if magic != _TABLE_MAGIC:
+            mm.close()
+            raise EulerlibInputError('prime_numbers','PrimeTable.load',
+                                     'file is not a prime table')
+        if version != _TABLE_VERSION:
+            mm.close()
+            raise EulerlibInputError('prime_numbers','PrimeTable.load',
+                                     'unsupported format version '
+                                     '{0}'.format(version))
+        if len(mm) != _TABLE_HEADER.size + nbytes:
+            mm.close()
+            raise EulerlibInputError('prime_numbers','PrimeTable.load',
+                                     'file is truncated')
+        return cls._from_buffer(memoryview(mm)[_TABLE_HEADER.size:], limit,
+                                count, mm)
+    
+    @classmethod
+    def _from_buffer(cls,bits,limit,count,mm=None):
+        """Returns a table that uses the bitmap *bits* (e.g. a memoryview of
+        a memory map) without copying it. *mm* is the memory map owned by
+        the table, if any.
+        """
+        table = cls.__new__(cls)
+        table.limit = limit
+        table.count = count
+        table._mmap = mm
+        table._rank = None
+        table._bits = bits
+        return table
+    
+    def close(self):
+        """Releases the memory map of a table returned by :meth:`load`.
+        """
+        if isinstance(self._bits, memoryview):
+            self._bits.release()
+            self._bits = bytearray()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
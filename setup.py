@@ -33,8 +33,8 @@ setup(name='eulerlib',
       classifiers=[
         'Development Status :: 4 - Beta',
         'License :: OSI Approved :: Apache Software License',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
         'Topic :: Scientific/Engineering :: Mathematics',
         'Intended Audience :: Developers',
         'Intended Audience :: Science/Research',
@@ -42,6 +42,7 @@ setup(name='eulerlib',
       ],
       keywords='mathematics project_euler number_theory prime_numbers',
       packages= find_packages(exclude=['eulerlib._tests']),
+      python_requires='>=3.7',
       test_suite='eulerlib._tests',
       zip_safe=False)
 